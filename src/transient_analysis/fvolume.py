@@ -0,0 +1,154 @@
+"""
+Fernando Jose Lavarreda Urizar
+Finite volume backend for Unidemensional Transiet Heat Conduction
+Spheres, Walls and Cylinders with properties that may change with temperature
+
+The body is divided in cells of the same thickness from the center to the surface, every step is implicit (theta=1)
+or Crank-Nicolson (theta=0.5) and its tridiagonal system is solved with cyclic reduction
+"""
+
+import numpy as np
+from typing import Callable, List, Tuple, Union
+from . import instrumentation
+from .ganalysis import CURVATURE, _coordinates
+
+
+MAX_STEPS = 10_000_000
+Property = Union[float, Callable[[np.ndarray], np.ndarray]]
+
+
+
+def temp_profiles(*, typ_:str, st:float, at:float, length:float, times:List[float], cond:Property, conv:float, cp:Property=None,\
+                  density:float=None, alfa:float=None, dx:float=None, coord:List[float]=None, cells:int=200, theta:float=0.5,\
+                  max_change:float=None, dt:float=None)->Tuple[List[float], List[List[float]]]:
+    """
+    Temperature profiles computed with finite volumes, same output as ganalysis.temp_profiles
+    typ_: Type of object to be analyzed 'p', 'c' or 'e'
+    st: starting temperature of the object
+    at: temperature of the surroundings
+    length: half the length of entire wall or whole radius of cylinder or radius of sphere
+    times: list with times to create profiles
+    cond: conductivity constant, or function of the temperature (receives and returns arrays)
+    conv: convection constant of the system
+    cp: specific heat, or function of the temperature
+    density: density of the material
+    alfa: thermal diffusivity, replaces cp and density when cond is constant
+    dx, coord: positions where to report temperatures as in temp_profile, interpolated between the centers of the cells
+    cells: number of cells from the center to the surface
+    theta: 1 implicit, 0.5 Crank-Nicolson
+    max_change: largest change of temperature of a cell in a step, 1% of |st-at| by default. Steps grow while the changes
+    are below it and are repeated with half the size when it is exceeded
+    dt: first step, a tenth of the time to diffuse through a cell by default
+    Properties are evaluated with the temperatures at the start of each step
+
+    return coordinates and temperature profiles for each time
+    """
+    assert typ_ in CURVATURE, f"Not supported. Supported types: {' '.join(list(CURVATURE.keys()))}"
+    assert len(times), "No timestamps provided"
+    assert 0.5<=theta<=1, "theta must be between 0.5 (Crank-Nicolson) and 1 (implicit)"
+    if cp is None or density is None:
+        assert alfa is not None and not callable(cond), "Not enough parameters to define the heat capacity"
+        capacity = lambda temperatures: np.full(temperatures.shape, cond/alfa) #density*cp
+    else:
+        capacity = lambda temperatures: density*_evaluate_property(cp, temperatures)
+    instrumentation.count("fvolume.temp_profiles")
+    m = CURVATURE[typ_]
+    width = length/cells
+    faces = np.arange(cells+1)*width
+    centers = (faces[:-1]+faces[1:])/2
+    areas = faces**m
+    volumes = (faces[1:]**(m+1)-faces[:-1]**(m+1))/(m+1)
+    if max_change is None:
+        max_change = 0.01*abs(st-at) or 1
+    temperatures = np.full(cells, float(st))
+    if dt is None:
+        dt = 0.1*width**2*np.min(capacity(temperatures)/_evaluate_property(cond, temperatures))
+    #Preallocated system: lower, diagonal, upper and right hand side
+    lower, diagonal, upper, rhs = np.zeros(cells), np.zeros(cells), np.zeros(cells), np.zeros(cells)
+    order = np.argsort(times)
+    targets = np.asarray(times, dtype=float)[order]
+    assert targets[0]>=0, "Times must be positive"
+    results = np.empty((len(targets), cells))
+    surfaces = np.empty(len(targets))
+    now = 0.0
+    steps = 0
+    for index, target in enumerate(targets):
+        while now<target:
+            step = min(dt, target-now)
+            k = _evaluate_property(cond, temperatures)
+            heat = capacity(temperatures)*volumes/step
+            #Conductance of the inner faces (mean conductivity) and of the surface (half cell plus convection)
+            inner = areas[1:-1]*(k[:-1]+k[1:])/2/width
+            outer = areas[-1]/(1/conv+width/2/k[-1])
+            flow = np.zeros(cells) #Heat entering each cell at the start of the step
+            flow[:-1] += inner*(temperatures[1:]-temperatures[:-1])
+            flow[1:] += inner*(temperatures[:-1]-temperatures[1:])
+            flow[-1] += outer*(at-temperatures[-1])
+            lower[1:] = -theta*inner
+            upper[:-1] = -theta*inner
+            diagonal[:] = heat
+            diagonal[:-1] += theta*inner
+            diagonal[1:] += theta*inner
+            diagonal[-1] += theta*outer
+            rhs[:] = heat*temperatures+(1-theta)*flow
+            rhs[-1] += theta*outer*at
+            updated = cyclic_reduction(lower, diagonal, upper, rhs)
+            change = np.max(np.abs(updated-temperatures))
+            steps += 1
+            if steps>MAX_STEPS:
+                raise StopIteration("Maximum number of steps reached")
+            if change>max_change and step>1e-12*max(target, 1):
+                dt = step/2
+                continue
+            temperatures = updated
+            now += step
+            if step == dt:
+                dt *= min(2, 0.9*max_change/change) if change else 2
+        results[index] = temperatures
+        k = _evaluate_property(cond, temperatures[-1:])[0]
+        surfaces[index] = (k/(width/2)*temperatures[-1]+conv*at)/(k/(width/2)+conv)
+    instrumentation.count("fvolume.steps", steps)
+    coordinates = _coordinates(coord, dx, length)
+    positions = np.concatenate([[0], centers, [length]])
+    profiles = np.empty((len(targets), len(coordinates)))
+    profiles[order] = [np.interp(coordinates, positions, np.concatenate([[cell[0]], cell, [surface]]))\
+                       for cell, surface in zip(results, surfaces)]
+    return coordinates, profiles.tolist()
+
+
+
+def _evaluate_property(value:Property, temperatures:np.ndarray)->np.ndarray:
+    """Value of a property for each temperature, constant or function of the temperature"""
+    if callable(value):
+        return np.asarray(value(temperatures), dtype=float)
+    return np.full(temperatures.shape, float(value))
+
+
+
+def cyclic_reduction(lower:np.ndarray, diagonal:np.ndarray, upper:np.ndarray, rhs:np.ndarray)->np.ndarray:
+    """
+       Solve a tridiagonal system in O(N) operations, stable for diagonally dominant systems
+       lower: coefficients below the diagonal, lower[0] is not used
+       diagonal: coefficients of the diagonal
+       upper: coefficients above the diagonal, upper[-1] is not used
+       rhs: right hand side
+       Every level eliminates the unknowns of even index from the equations of odd index, halving the system with whole array
+       operations (the recursion of the Thomas algorithm can not be vectorized), then the even unknowns are recovered going back
+    """
+    n = len(diagonal)
+    size = (1<<n.bit_length())-1 #2**k-1 equations, the extra ones are x = 0
+    a, b, c, d = np.zeros(size), np.ones(size), np.zeros(size), np.zeros(size)
+    a[1:n], b[:n], c[:n-1], d[:n] = lower[1:], diagonal, upper[:-1], rhs
+    levels = []
+    while len(b)>1:
+        levels.append((a, b, c, d))
+        alpha = -a[1::2]/b[:-1:2]
+        gamma = -c[1::2]/b[2::2]
+        a, b, c, d = alpha*a[:-1:2], b[1::2]+alpha*c[:-1:2]+gamma*a[2::2], gamma*c[2::2], d[1::2]+alpha*d[:-1:2]+gamma*d[2::2]
+    x = d/b
+    for a, b, c, d in reversed(levels):
+        full = np.zeros(len(b)+2) #Padded with the x = 0 outside the system
+        full[2:-1:2] = x
+        full[1:-1:2] = (d[::2]-a[::2]*full[0:-2:2]-c[::2]*full[2::2])/b[::2]
+        x = full[1:-1]
+    return x[:n]
@@ -4,9 +4,36 @@ Gradient analysis for Unidemensional Transiet Heat Conduction
 Spheres, Walls and Cylinders
 """
 
-from typing import List, Tuple
+import os
+import json
+import numpy as np
+from typing import Callable, Iterable, Iterator, List, Tuple
+from itertools import islice
+from collections import OrderedDict
+from threading import Lock
 from math import cos, sin, exp, pi
-from .zeros import bessel, c_lambdas, e_lambdas, p_lambdas 
+from . import instrumentation
+from .zeros import bessel_j01, c_lambdas, e_lambdas, p_lambdas 
+
+
+MAX_LAMBDAS = 1000 #Most lambdas used to meet a tolerance
+CURVATURE = {'p':0, 'c':1, 'e':2} #Exponent of the distance to the center in the volume of the object
+CACHE_BYTES = 64*2**20 #Size of the coefficients kept by the coefficient cache
+ONE_TERM_TAU = 0.2 #From this adimensional time on the first lambda is enough (error below 2%)
+#Below these adimensional times the semi-infinite solid is used, validated against the converged series to differ by less
+#than SEMI_INFINITE_ERROR of (st-at) for biots from 0.01 to 1000. From half the value to the value it is blended with the series
+SEMI_INFINITE_TAU = {'p':0.015, 'c':0.002, 'e':0.01}
+SEMI_INFINITE_ERROR = 1.2e-4
+BLEND_TOLERANCE = 1e-6 #Accuracy of the series inside the blend
+LUMPED_BIOT = 0.1 #Below this biot, computed with the equivalent length, the body is taken as isothermal
+EQUIVALENT_LENGTH = {'p':1, 'c':1/2, 'e':1/3} #Volume/Area as a fraction of the length
+REGIMES = ("series", "auto", "lumped")
+#1D factors of the product solutions, lengths are given in this order
+SHAPES = {
+            'short-cylinder':('c', 'p'), #radius, half the height
+            'bar':('p', 'p'), #half of each side
+            'brick':('p', 'p', 'p'),
+}
 
 
 
@@ -39,6 +66,7 @@ def gradient_p(lambdas:List[float], position:float, length:float, tau:float)->fl
        tau: adimensional time
     """
     assert lambdas, "No lambdas provided"
+    instrumentation.terms(len(lambdas))
     accummulated_gradientes = []
     for i in lambdas:
         accummulated_gradientes.append((4*sin(i))/(2*i+sin(2*i))*exp(-i**2*tau)*cos(i*position/length))
@@ -54,6 +82,7 @@ def gradient_e(lambdas:List[float], position:float, radius:float, tau:float)->fl
        tau: adimensional time
     """
     assert lambdas, "No lambdas provided"
+    instrumentation.terms(len(lambdas))
     accummulated_gradientes = []
     for i in lambdas:
         if position == 0:
@@ -71,11 +100,12 @@ def gradient_c(lambdas:List[float], position:float, radius:float, tau:float)->fl
        radius: radius of the cylinder
        tau: adimensional time
     """
-    assert lambdas, "No lambdas provided"
-    accummulated_gradientes = []
-    for i in lambdas:
-        accummulated_gradientes.append(2/i*bessel(i, 1)/(bessel(i, 0)**2+bessel(i, 1)**2)*exp(-i**2*tau)*bessel(i*position/radius, 0))
-    return sum(accummulated_gradientes)
+    assert len(lambdas), "No lambdas provided"
+    instrumentation.terms(len(lambdas))
+    lambdas = np.asarray(lambdas, dtype=float)
+    j0, j1 = bessel_j01(lambdas)
+    profile, _ = bessel_j01(lambdas*position/radius)
+    return float(np.sum(2/lambdas*j1/(j0**2+j1**2)*np.exp(-lambdas**2*tau)*profile))
 
 
 
@@ -171,6 +201,106 @@ def q_e(temp_profile:List[float], ts:float, radius:float, d:float, cp:float)->fl
 
 
 
+def q_p_batch(temp_profiles:np.ndarray, coordinates:List[float], ts:float, area:float, d:float, cp:float)->np.ndarray:
+    """Heat transference for a wall at many moments in time, batch version of q_p
+       temp_profiles: array T[time, coordinate] of temperature profiles from the center to the exterior of the wall
+       coordinates: increasing distances from the center where the temperatures were taken, they may be non-uniform
+       ts: starting temperature of the wall
+       area: area of cross section for the wall
+       d: density of the wall
+       cp: specific heat of the wall
+       returns Q for each time, for the entire wall as q_p
+    """
+    return _q_batch(temp_profiles, volume_weights('p', coordinates, area=area), ts, d, cp)
+
+
+
+def q_c_batch(temp_profiles:np.ndarray, coordinates:List[float], ts:float, length:float, d:float, cp:float)->np.ndarray:
+    """Heat transference for a cylinder at many moments in time, batch version of q_c
+       temp_profiles: array T[time, coordinate] of temperature profiles from the center to the exterior
+       coordinates: increasing distances from the center where the temperatures were taken, they may be non-uniform
+       ts: starting temperature of the cylinder
+       length: length of the cylinder
+       d: density of the cylinder
+       cp: specific heat of the cylinder
+       returns Q for each time
+    """
+    return _q_batch(temp_profiles, volume_weights('c', coordinates, length=length), ts, d, cp)
+
+
+
+def q_e_batch(temp_profiles:np.ndarray, coordinates:List[float], ts:float, d:float, cp:float)->np.ndarray:
+    """Heat transference for a sphere at many moments in time, batch version of q_e
+       temp_profiles: array T[time, coordinate] of temperature profiles from the center to the exterior
+       coordinates: increasing distances from the center where the temperatures were taken, they may be non-uniform
+       ts: starting temperature of the sphere
+       d: density of the sphere
+       cp: specific heat of the sphere
+       returns Q for each time
+    """
+    return _q_batch(temp_profiles, volume_weights('e', coordinates), ts, d, cp)
+
+
+
+def _q_batch(temp_profiles:np.ndarray, weights:np.ndarray, ts:float, d:float, cp:float)->np.ndarray:
+    """Weighted reduction shared by the batch versions of q_p, q_c and q_e"""
+    temp_profiles = np.asarray(temp_profiles, dtype=float)
+    assert temp_profiles.shape[-1] == len(weights), "Every profile needs a temperature per coordinate"
+    return d*cp*((temp_profiles-ts)@weights)
+
+
+
+def volume_weights(typ_:str, coordinates:List[float], area:float=1, length:float=1)->np.ndarray:
+    """Weights w so that w@f is the integral of f over the volume of the body, compute them once per grid
+       typ_: Type of object 'p', 'c' or 'e'
+       coordinates: increasing distances from the center, they may be non-uniform
+       area: area of cross section for a wall, both halves of the wall are included
+       length: length of a cylinder
+    """
+    coordinates = np.asarray(coordinates, dtype=float)
+    weights = simpson_weights(coordinates)
+    if typ_ == 'p':
+        return 2*area*weights
+    if typ_ == 'c':
+        return 2*pi*length*coordinates*weights
+    assert typ_ == 'e', f"Not supported. Supported types: {' '.join(list(LAMBDAS.keys()))}"
+    return 4*pi*coordinates**2*weights
+
+
+
+def simpson_weights(coordinates:List[float])->np.ndarray:
+    """Weights of the composite Simpson rule for non-uniform coordinates, w@f is the integral of f between the first and last coordinate
+       Each pair of intervals integrates the parabola through its three points, with an odd number of intervals the last one
+       integrates the parabola through the last three points. Two coordinates give the trapezoidal rule
+    """
+    x = np.asarray(coordinates, dtype=float)
+    assert x.ndim == 1 and len(x)>1, "At least two coordinates are needed"
+    assert np.all(np.diff(x)>0), "Coordinates must be increasing"
+    weights = np.zeros(len(x))
+    if len(x) == 2:
+        weights += (x[1]-x[0])/2
+        return weights
+    starts = np.arange(0, len(x)-2, 2)
+    _parabola(weights, x, starts, x[starts], x[starts+2])
+    if (len(x)-1)%2:
+        last = np.array([len(x)-3])
+        _parabola(weights, x, last, x[-2:-1], x[-1:])
+    return weights
+
+
+
+def _parabola(weights:np.ndarray, x:np.ndarray, starts:np.ndarray, lower:np.ndarray, upper:np.ndarray)->None:
+    """Add to weights the integral from lower to upper of the Lagrange polynomials through x[starts], x[starts+1], x[starts+2]"""
+    nodes = np.stack([x[starts], x[starts+1], x[starts+2]])-x[starts] #Shifted to the first node to avoid cancellation
+    a, b = lower-x[starts], upper-x[starts]
+    moments = [b-a, (b**2-a**2)/2, (b**3-a**3)/3]
+    for i in range(3):
+        j, k = [index for index in range(3) if index != i]
+        integral = moments[2]-(nodes[j]+nodes[k])*moments[1]+nodes[j]*nodes[k]*moments[0]
+        np.add.at(weights, starts+i, integral/((nodes[i]-nodes[j])*(nodes[i]-nodes[k])))
+
+
+
 def temperature_g(gradient, st, at)->float:
     """
     Obtain the temperature of a point based on a temperature gradient
@@ -186,7 +316,8 @@ def temperature_g(gradient, st, at)->float:
 
 def temp_profile(*, typ_:str, st:float, at:float, length:float, time_:float, nlambdas:int=6, dx:float=None, cond:float=None,\
                     conv:float=None, alfa:float=None, biot_:float=None, lambdas_:List[float]=None, coord:List[float]=None, \
-                    cp:float=None, density:float=None, performant_coeff:List[float]=[], detailed:bool=False)->List[float]:
+                    cp:float=None, density:float=None, performant_coeff:List[float]=[], detailed:bool=False, tolerance:float=None,\
+                    regime:str="series")->List[float]:
     """
     Obtain temperature profile for a wall
     typ_: Type of object to be analyzed
@@ -209,60 +340,506 @@ def temp_profile(*, typ_:str, st:float, at:float, length:float, time_:float, nla
     coord: list of distances where to compute temperatures, if not provided dx must be provided
     performant_coeff: precomputed coefficients for the gradients of each coordinate
     detailed: determine whether to return alfa, biot and lambdas, useful to cut time for future calculations
+    tolerance: maximum error in temperature, when given nlambdas is replaced by the number of lambdas that meets it (check terms_needed)
+    regime: 'series' always sums the series, 'auto' uses only the first lambda from ONE_TERM_TAU on and the semi-infinite
+    solid below SEMI_INFINITE_TAU (blended with the series from half of it), with a tolerance each only where it is met (one
+    lambda where terms_needed gives one, the semi-infinite solid when the tolerance is above SEMI_INFINITE_ERROR of |st-at|),
+    'lumped' takes the body as isothermal (check lumped)
+    which 'auto' also does when the biot with the equivalent length is below LUMPED_BIOT and no tolerance is given (the error of
+    the isothermal body is not bounded by it, the series is used instead). When the regime is not 'series' the
+    detailed output adds the regime used ('series', 'one-term', 'blended', 'semi-infinite' or 'lumped'), when lumped no lambdas
+    are returned
+    """
+    instrumentation.count("temp_profile")
+    alfa, lambdas, biot_sys, coordinates, gradients, regimes = _evaluate([time_], typ_=typ_, st=st, at=at, length=length, nlambdas=nlambdas,\
+                                                                         dx=dx, cond=cond, conv=conv, alfa=alfa, biot_=biot_, lambdas_=lambdas_,\
+                                                                         coord=coord, cp=cp, density=density, performant_coeff=performant_coeff,\
+                                                                         tolerance=tolerance, regime=regime)
+    temperatures = temperature_g(gradients[0], st, at).tolist()
+    if detailed:
+        if regime != "series":
+            return alfa, lambdas, biot_sys, coordinates, temperatures, regimes[0]
+        return alfa, lambdas, biot_sys, coordinates, temperatures
+    return coordinates, temperatures
+
+
+
+def _evaluate(times:List[float], *, typ_:str, st:float, at:float, length:float, nlambdas:int=6, dx:float=None, cond:float=None,\
+              conv:float=None, alfa:float=None, biot_:float=None, lambdas_:List[float]=None, coord:List[float]=None, cp:float=None,\
+              density:float=None, performant_coeff:List[float]=[], tolerance:float=None, regime:str="series")->tuple:
+    """
+    Gradients of a system for several times, check temp_profile arguments
+    returns alfa, lambdas, biot, coordinates, gradients G[time, coordinate] and the regime of each time
+    """
+    assert regime in REGIMES, f"Not supported. Supported regimes: {' '.join(REGIMES)}"
+    assert typ_ in LAMBDAS, f"Not supported. Supported types: {' '.join(list(LAMBDAS.keys()))}"
+    alfa = _diffusivity(alfa, cond, cp, density)
+    taus = tau(alfa, np.asarray(times, dtype=float), length)
+    biot_sys = _biot(biot_, conv, length, cond)
+    if _is_lumped(typ_, biot_sys, regime, tolerance):
+        coordinates = _coordinates(coord, dx, length)
+        with instrumentation.phase("lumped"):
+            gradients = np.outer(lumped(typ_, biot_sys, taus), np.ones(len(coordinates)))
+        return alfa, [], biot_sys, coordinates, gradients, ["lumped"]*len(taus)
+    counts, regimes = _plan(taus, typ_=typ_, st=st, at=at, nlambdas=nlambdas, lambdas_=lambdas_, tolerance=tolerance, regime=regime)
+    summed = regimes != "semi-infinite"
+    alfa, biot_sys, coordinates, lambdas = _system(typ_=typ_, length=length, nlambdas=int(max(counts[summed], default=0)) or 1, dx=dx, cond=cond,\
+                                                   conv=conv, alfa=alfa, biot_=biot_, lambdas_=lambdas_, coord=coord, cp=cp, density=density)
+    with instrumentation.phase("coefficients"):
+        if len(performant_coeff):
+            coefficients = np.asarray(performant_coeff, dtype=float)
+        else:
+            coefficients = cached_coefficients(typ_, lambdas, coordinates, length)
+    with instrumentation.phase("series"):
+        if regime == "series":
+            gradients = series(coefficients, lambdas, taus, None if tolerance == None else counts)
+        else:
+            gradients = np.empty((len(taus), len(coordinates)))
+            gradients[summed] = series(coefficients, lambdas, taus[summed], counts[summed])
+        gradients[counts == 0] = 1 #tau 0 with a tolerance, nothing has changed yet
+    _short_times(typ_, biot_sys, np.asarray(coordinates, dtype=float)[None, :]/length, taus[:, None], regimes, gradients)
+    return alfa, lambdas, biot_sys, coordinates, gradients, regimes.tolist()
+
+
+
+def _plan(taus:np.ndarray, *, typ_:str, st:float, at:float, nlambdas:int, lambdas_:List[float], tolerance:float, regime:str)->tuple:
+    """Number of lambdas and regime ('series', 'one-term', 'blended' or 'semi-infinite') of each adimensional time"""
+    counts = np.asarray(_counts(taus, tolerance, st, at, nlambdas))
+    regimes = np.full(len(taus), "series", dtype=object)
+    if regime == "auto":
+        crossover = SEMI_INFINITE_TAU[typ_]
+        #With a tolerance the first lambda is used only where it meets it, not wherever its usual 2% error is accepted
+        regimes[(taus>=ONE_TERM_TAU)&((counts<=1) if tolerance != None else True)] = "one-term"
+        #Same for the semi-infinite solid, a tolerance below its error keeps the series
+        if tolerance == None or st == at or tolerance/abs(st-at)>=SEMI_INFINITE_ERROR:
+            regimes[taus<crossover] = "blended"
+            regimes[taus<crossover/2] = "semi-infinite"
+        counts = np.where(regimes == "one-term", 1, counts)
+        counts = np.where(regimes == "blended", np.maximum(counts, terms_needed(taus, BLEND_TOLERANCE)), counts)
+    if tolerance != None:
+        most = len(lambdas_) if lambdas_ is not None and len(lambdas_) else MAX_LAMBDAS
+        unmet = (counts>most)&(regimes != "semi-infinite")
+        if unmet.any():
+            raise ValueError(f"The tolerance can not be met with {most} lambdas at tau {taus[unmet].min():g}")
+    return counts, regimes
+
+
+
+def _is_lumped(typ_:str, biot:float, regime:str, tolerance:float)->bool:
+    """
+    Whether the body is taken as isothermal, always with 'lumped' and with 'auto' below LUMPED_BIOT unless a tolerance is
+    given, the error of the lumped body is not bounded by it
+    """
+    return regime == "lumped" or regime == "auto" and tolerance == None and biot*EQUIVALENT_LENGTH[typ_]<LUMPED_BIOT
+
+
+
+def _short_times(typ_:str, biot:float, positions:np.ndarray, taus:np.ndarray, regimes:np.ndarray, gradients:np.ndarray)->None:
+    """
+    Semi-infinite solid at the times _plan marks 'semi-infinite' or 'blended', blended with the series from half of SEMI_INFINITE_TAU
+    positions, taus: relative positions and adimensional times that broadcast to the shape of gradients
+    regimes: regime of each entry of the first axis of gradients
+    gradients: summed series where the regime is not 'semi-infinite', replaced in place
+    """
+    short = (regimes == "semi-infinite")|(regimes == "blended")
+    if not short.any():
+        return
+    with instrumentation.phase("semi-infinite"):
+        crossover = SEMI_INFINITE_TAU[typ_]
+        positions, taus = np.broadcast_arrays(positions, taus)
+        semi = _semi_infinite(typ_, biot, positions[short], taus[short])
+        weight = np.clip((crossover-taus[short])/(crossover/2), 0, 1) #1 semi-infinite, 0 series
+        summed = (regimes[short] != "semi-infinite").reshape((-1,)+(1,)*(gradients.ndim-1))
+        gradients[short] = weight*semi+(1-weight)*np.where(summed, gradients[short], 0)
+
+
+
+def lumped(typ_:str, biot:float, taus:List[float])->np.ndarray:
+    """
+       Gradient of an isothermal body (lumped capacitance), exp(-b*time) with b = conv/(density*cp*Lc)
+       typ_: Type of object 'p', 'c' or 'e'
+       biot: biot of the system computed with the length (not the equivalent length)
+       taus: adimensional times computed with the length
+       With the equivalent length Lc = Volume/Area (L, R/2, R/3) b*time = biot*tau*length/Lc, no lambdas are needed
+       returns the gradient for each time
+    """
+    return np.exp(-biot*np.asarray(taus, dtype=float)/EQUIVALENT_LENGTH[typ_])
+
+
+
+def semi_infinite(typ_:str, biot:float, positions:List[float], taus:List[float])->np.ndarray:
+    """
+       Gradient of a semi-infinite solid with surface convection, valid while the penetration depth is small compared to the length
+       typ_: Type of object 'p', 'c' or 'e'
+       biot: biot of the system
+       positions: coordinates divided by the length (0 center, 1 surface)
+       taus: adimensional times
+       With s = 1-position and xi = s/(2*sqrt(tau)) the fraction of the change reached by a wall is
+       F(B) = erfc(xi)-exp(B*s+B**2*tau)*erfc(xi+B*sqrt(tau)) with B = biot. Curvature is taken into account writing
+       the solution for r**m*T (m = 1/2 cylinder, 1 sphere, exact for the sphere) which turns into the wall problem with
+       B = biot-m, then the gradient is 1-biot/B*F(B)/position**m
+       returns gradients G[time, position]
+    """
+    return _semi_infinite(typ_, biot, np.asarray(positions, dtype=float)[None, :], np.asarray(taus, dtype=float)[:, None])
+
+
+
+def _semi_infinite(typ_:str, biot:float, positions:np.ndarray, taus:np.ndarray)->np.ndarray:
+    """Gradient of the semi-infinite solid for positions and taus that broadcast together, check semi_infinite"""
+    curvature = {'p':0, 'c':0.5, 'e':1}[typ_]
+    started = taus>0 #Nothing has changed at tau 0
+    root = np.sqrt(np.where(started, taus, 1))
+    xi = (1-positions)/(2*root)
+    gaussian = np.exp(-xi**2)
+    b = biot-curvature
+    if abs(b)>1e-8:
+        #exp(B*s+B**2*tau)*erfc(xi+B*sqrt(tau)) == exp(-xi**2)*erfcx(xi+B*sqrt(tau))
+        reached = biot/b*gaussian*(erfcx(xi)-erfcx(xi+b*root))
+    else:
+        reached = biot*2*root*gaussian*(1/np.sqrt(pi)-xi*erfcx(xi)) #Limit when biot == m
+    if curvature:
+        inside = positions>0
+        reached = np.where(inside, reached/np.where(inside, positions, 1)**curvature, 0) #Center is never reached while valid
+    return np.where(started, 1-reached, 1)
+
+
+
+def erfcx(z:np.ndarray)->np.ndarray:
+    """
+       Scaled complementary error function exp(z**2)*erfc(z) for arrays, relative error below 1.2e-7
+       Chebyshev fit of erfc from Numerical Recipes, which does not need exp(-z**2) for positive values
+    """
+    z = np.asarray(z, dtype=float)
+    a = np.abs(z)
+    t = 1/(1+0.5*a)
+    scaled = t*np.exp(-1.26551223+t*(1.00002368+t*(0.37409196+t*(0.09678418+t*(-0.18628806+t*(0.27886807+\
+                      t*(-1.13520398+t*(1.48851587+t*(-0.82215223+t*0.17087277)))))))))
+    negative = z<0
+    scaled[negative] = 2*np.exp(z[negative]**2)-scaled[negative] #erfc(-z) = 2-erfc(z)
+    return scaled
+
+
+
+def _system(*, typ_:str, length:float, nlambdas:int=6, dx:float=None, cond:float=None, conv:float=None, alfa:float=None, biot_:float=None,\
+            lambdas_:List[float]=None, coord:List[float]=None, cp:float=None, density:float=None)->Tuple[float, float, List[float], List[float]]:
+    """
+    Resolve the diffusivity, biot, coordinates and lambdas of a system, check temp_profile arguments
+    returns alfa, biot, coordinates and lambdas
     """
-    
     assert not alfa == None or (not cp == None and not density == None), "Not enough parameters to define diffusivity"
-    assert not biot == None or (not conv == None and not cond == None), "Not enough parameters to define biot"
+    assert not biot_ == None or (not conv == None and not cond == None), "Not enough parameters to define biot"
     assert not coord == None or not dx == None, "Cant't determine coordinates to compute temperatures"
-    #Currently supported types of objects with formulas for gradient and lambda determination
-    typ = {
-            'e': (gradient_e, e_lambdas),
-            'c': (gradient_c, c_lambdas),
-            'p': (gradient_p, p_lambdas),
-            
-          }
-    assert typ_ in typ, f"Not supported. Supported types: {' '.join(list(typ.keys()))}"
+    assert typ_ in LAMBDAS, f"Not supported. Supported types: {' '.join(list(LAMBDAS.keys()))}"
     
     if alfa == None:
         alfa = cond/(cp*density)
-    if biot_ == None:
-        biot_sys = biot(conv, length, cond)
-    else:
-        biot_sys = biot_
-    tau_ = tau(alfa, time_, length)
-    #Set positions where to determine temperatures
-    if coord:
-        coordinates = coord
-    else:
-        coordinates = [0]
-        curr = 1
-        value = curr*dx
-        while value<length:
-            coordinates.append(value)
-            curr+=1
-            value = curr*dx
-        coordinates.append(length)
-    temperatures = []
-    #---------------------------------------------
+    biot_sys = _biot(biot_, conv, length, cond)
+    coordinates = _coordinates(coord, dx, length)
     
-    if lambdas_:
+    if lambdas_ is not None and len(lambdas_):
         lambdas = lambdas_
     else:
-        lambdas = typ[typ_][1](biot_sys, nlambdas)
-    
-    counter = 0
-    if performant_coeff:
-        for coordinate in coordinates:
-            gradient = gradient_performant(performant_coeff[counter], lambdas, tau_)
-            temperatures.append(temperature_g(gradient, st, at))
-            counter+=1
-    else:
-        for coordinate in coordinates:
-            gradient = typ[typ_][0](lambdas, coordinate, length, tau_)
-            temperatures.append(temperature_g(gradient, st, at))
-    if detailed:
-        return alfa, lambdas, biot_sys, coordinates, temperatures
-    return coordinates, temperatures
+        with instrumentation.phase("lambdas"):
+            lambdas = LAMBDAS[typ_](biot_sys, nlambdas)
+    return alfa, biot_sys, coordinates, lambdas
+
+
+
+def _biot(biot_:float, conv:float, length:float, cond:float)->float:
+    """Biot of the system from its definition when it is not provided"""
+    assert not biot_ == None or (not conv == None and not cond == None), "Not enough parameters to define biot"
+    if biot_ == None:
+        return biot(conv, length, cond)
+    return biot_
+
+
+
+def _coordinates(coord:List[float], dx:float, length:float)->List[float]:
+    """Positions where to determine temperatures, coord or from the center to the length every dx"""
+    assert not coord == None or not dx == None, "Cant't determine coordinates to compute temperatures"
+    if coord is not None and len(coord):
+        return coord
+    coordinates = [0]
+    curr = 1
+    value = curr*dx
+    while value<length:
+        coordinates.append(value)
+        curr+=1
+        value = curr*dx
+    coordinates.append(length)
+    return coordinates
+
+
+
+def _diffusivity(alfa:float, cond:float, cp:float, density:float)->float:
+    """Thermal diffusivity from its definition when it is not provided"""
+    assert not alfa == None or (not cp == None and not density == None), "Not enough parameters to define diffusivity"
+    if alfa == None:
+        return cond/(cp*density)
+    return alfa
+
+
+
+def _counts(taus:List[float], tolerance:float, st:float, at:float, nlambdas:int)->List[int]:
+    """
+    Number of lambdas for each adimensional time, nlambdas unless a tolerance in temperature is given
+    Above MAX_LAMBDAS where it can not be met, 0 at tau 0 where the gradient is exactly 1
+    """
+    if tolerance == None:
+        return [nlambdas]*len(taus)
+    assert tolerance>0, "The tolerance must be positive"
+    return terms_needed(taus, tolerance/abs(st-at) if st != at else np.inf, MAX_LAMBDAS+1).tolist()
+
+
+
+def terms_needed(taus:List[float], tolerance:float, most:int=MAX_LAMBDAS)->np.ndarray:
+    """
+       Smallest number of lambdas for which the terms left out of the series add up to less than tolerance
+       taus: adimensional times
+       tolerance: acceptable error of the gradient (tx-at)/(st-at)
+       most: upper limit of lambdas, returned as well where the tolerance needs more
+       At tau 0 nothing has changed and no lambdas are needed, the gradient is exactly 1 (0 is returned)
+       For the three geometries |coefficient*eigenfunction| <= 2 and the lambda n+1 is bigger than n*pi, so the error
+       after n lambdas is at most 2*sum(exp(-(k*pi)**2*tau), k>=n) <= 2*exp(-(n*pi)**2*tau)/(1-exp(-(2n+1)*pi**2*tau))
+    """
+    taus = np.asarray(taus, dtype=float)
+    counts = np.zeros(taus.shape, dtype=int)
+    positive = taus>0
+    t = taus[positive]
+    n = np.ones_like(t)
+    for i in range(4):
+        #Fixed point of exp(-(n*pi)**2*tau) = tolerance/2*(1-exp(-(2n+1)*pi**2*tau))
+        margin = np.log(2/tolerance)-np.log1p(-np.exp(-(2*n+1)*pi**2*t))
+        n = np.maximum(np.ceil(np.sqrt(np.maximum(margin, 0)/t)/pi), 1)
+    bound = lambda n: 2*np.exp(-(n*pi)**2*t)/(-np.expm1(-(2*n+1)*pi**2*t))
+    pending = (bound(n)>tolerance)&(n<most)
+    while pending.any():
+        n[pending] += 1
+        pending = (bound(n)>tolerance)&(n<most)
+    counts[positive] = np.minimum(n, most)
+    return counts
+
+
+
+def series(coefficients:np.ndarray, lambdas:List[float], taus:List[float], counts:List[int]=None)->np.ndarray:
+    """
+       Sum of the series for several adimensional times
+       coefficients: array C[coordinate, lambda] from coefficient_matrix
+       lambdas: list of lambdas for the system
+       taus: adimensional times
+       counts: number of lambdas used at each time, all of them by default. Times that use the same number of lambdas are
+       computed with a single product
+       returns gradients G[time, coordinate]
+    """
+    lambdas = np.asarray(lambdas, dtype=float)
+    taus = np.asarray(taus, dtype=float)
+    if counts is None:
+        instrumentation.terms(coefficients.size*len(taus))
+        return (coefficients@decay_matrix(lambdas, taus)).T
+    counts = np.minimum(np.asarray(counts, dtype=int), len(lambdas))
+    gradients = np.empty((len(taus), coefficients.shape[0]))
+    for count in np.unique(counts):
+        selected = counts == count
+        instrumentation.terms(coefficients.shape[0]*count*int(selected.sum()))
+        gradients[selected] = (coefficients[:, :count]@decay_matrix(lambdas[:count], taus[selected])).T
+    return gradients
+
+
+
+def coefficient_matrix(typ_:str, lambdas:List[float], coordinates:List[float], length:float)->np.ndarray:
+    """
+       Coefficients of the series for every coordinate, the gradient at adimensional time tau is C@exp(-lambdas**2*tau)
+       typ_: Type of object 'p', 'c' or 'e'
+       lambdas: list of lambdas for the system
+       coordinates: distances relative to the center of the object
+       length: half the length of the wall or radius of the cylinder or sphere
+       returns array C[coordinate, lambda]
+    """
+    return amplitudes(typ_, lambdas)*eigenfunctions(typ_, lambdas, coordinates, length)
+
+
+
+def eigenfunctions(typ_:str, lambdas:List[float], coordinates:List[float], length:float)->np.ndarray:
+    """
+       Shape of each term of the series, cos(lambda*x) for walls, J0(lambda*x) for cylinders and sin(lambda*x)/(lambda*x) for spheres
+       with x the coordinate divided by the length
+       returns array X[coordinate, lambda]
+    """
+    lambdas = np.asarray(lambdas, dtype=float)
+    positions = np.asarray(coordinates, dtype=float)[:, None]/length
+    if typ_ == 'p':
+        return np.cos(lambdas*positions)
+    if typ_ == 'e':
+        #sinc avoids the zero division at the center
+        return np.sinc(lambdas*positions/pi)
+    profile, _ = bessel_j01(lambdas*positions)
+    return profile
+
+
+
+def norms(typ_:str, lambdas:List[float])->np.ndarray:
+    """
+       Integral of the square of each eigenfunction times x**m from the center to the surface (m = 0 wall, 1 cylinder, 2 sphere)
+       1/2+sin(2*lambda)/(4*lambda), (J0**2+J1**2)/2 and (1/2-sin(2*lambda)/(4*lambda))/lambda**2, they hold because of the
+       characteristic equation of the lambdas
+    """
+    lambdas = np.asarray(lambdas, dtype=float)
+    if typ_ == 'p':
+        return _at_zero(lambdas, 1, lambda l: 0.5+np.sin(2*l)/(4*l))
+    if typ_ == 'e':
+        return _at_zero(lambdas, 1/3, lambda l: (0.5-np.sin(2*l)/(4*l))/l**2)
+    j0, j1 = bessel_j01(lambdas)
+    return (j0**2+j1**2)/2
+
+
+
+def modal_projection(typ_:str, lambdas:List[float], coordinates:List[float], length:float)->np.ndarray:
+    """
+       Matrix that projects profiles sampled on the coordinates onto the eigenfunctions, P@profile are the coefficients of the series
+       The integral of profile*eigenfunction*x**m uses simpson_weights so the coordinates may be non-uniform, they must go from the
+       center to the surface
+       returns array P[lambda, coordinate]
+    """
+    positions = np.asarray(coordinates, dtype=float)/length
+    assert positions[0] == 0 and np.isclose(positions[-1], 1), "The profile must go from the center to the surface"
+    weights = simpson_weights(positions)*positions**CURVATURE[typ_]
+    return (eigenfunctions(typ_, lambdas, coordinates, length)*weights[:, None]).T/norms(typ_, lambdas)[:, None]
+
+
+
+class CoefficientCache:
+    """
+       Least recently used cache of coefficient matrices shared by every thread
+       maxbytes: size of the matrices kept, the least recently used are evicted when it is exceeded
+       The key is the type of object, the lambdas, the coordinates and the length so any change of system is a miss.
+       Matrices are returned read only since they are shared
+    """
+
+    def __init__(self, maxbytes:int=CACHE_BYTES):
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries:OrderedDict = OrderedDict()
+        self._lock = Lock()
+
+
+    def get(self, typ_:str, lambdas:List[float], coordinates:List[float], length:float)->np.ndarray:
+        """Coefficient matrix C[coordinate, lambda] of the system, check coefficient_matrix"""
+        lambdas = np.asarray(lambdas, dtype=float)
+        coordinates = np.asarray(coordinates, dtype=float)
+        key = (typ_, lambdas.tobytes(), coordinates.tobytes(), float(length))
+        with self._lock:
+            coefficients = self._entries.get(key)
+            if coefficients is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return coefficients
+            self.misses += 1
+        #Built outside the lock, two threads may build the same matrix but neither waits for the other
+        coefficients = coefficient_matrix(typ_, lambdas, coordinates, length)
+        coefficients.setflags(write=False)
+        with self._lock:
+            if key not in self._entries and coefficients.nbytes<=self.maxbytes:
+                self._entries[key] = coefficients
+                self.nbytes += coefficients.nbytes
+                while self.nbytes>self.maxbytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self.nbytes -= evicted.nbytes
+                    self.evictions += 1
+        return coefficients
+
+
+    def stats(self)->dict:
+        """Hits, misses, evictions, entries and bytes used"""
+        with self._lock:
+            return {"hits":self.hits, "misses":self.misses, "evictions":self.evictions, "entries":len(self._entries),\
+                    "nbytes":self.nbytes, "maxbytes":self.maxbytes}
+
+
+    def clear(self)->None:
+        """Remove every matrix and reset the statistics"""
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = self.hits = self.misses = self.evictions = 0
+
+
+
+def cached_coefficients(typ_:str, lambdas:List[float], coordinates:List[float], length:float)->np.ndarray:
+    """Coefficient matrix from COEFFICIENTS, built only the first time a system is seen (check coefficient_matrix)"""
+    return COEFFICIENTS.get(typ_, lambdas, coordinates, length)
+
+
+
+def amplitudes(typ_:str, lambdas:List[float])->np.ndarray:
+    """
+       Coefficient A of each term of the series, the gradient at the center
+       typ_: Type of object 'p', 'c' or 'e'
+       lambdas: list of lambdas for the system
+    """
+    lambdas = np.asarray(lambdas, dtype=float)
+    if typ_ == 'p':
+        return _at_zero(lambdas, 1, lambda l: (4*np.sin(l))/(2*l+np.sin(2*l)))
+    if typ_ == 'e':
+        return _at_zero(lambdas, 1, lambda l: 4*(np.sin(l)-l*np.cos(l))/(2*l-np.sin(2*l)))
+    def cylinder(l):
+        j0, j1 = bessel_j01(l)
+        return 2/l*j1/(j0**2+j1**2)
+    return _at_zero(lambdas, 1, cylinder)
+
+
+
+def _at_zero(lambdas:np.ndarray, limit:float, function:Callable[[np.ndarray], np.ndarray])->np.ndarray:
+    """function of the lambdas replaced by its limit close to 0 (the first lambda of a biot of 0), where it is 0/0"""
+    small = lambdas<1e-4
+    return np.where(small, limit, function(np.where(small, 1, lambdas)))
+
+
+
+def heat_transfer_history(typ_:str, lambdas:List[float], times:List[float], alfa:float, length:float, qmax:float=1)->np.ndarray:
+    """
+       Heat transferred from the start until each time, exact for the series instead of integrating a profile (q_p, q_c, q_e)
+       typ_: Type of object 'p', 'c' or 'e'
+       lambdas: list of lambdas for the system, e.g. the ones returned by a detailed temp_profile
+       times: moments in time
+       alfa: thermal diffusivity
+       length: half the length of the wall or radius of the cylinder or sphere
+       qmax: most heat that can be transferred, density*volume*cp*(at-st) has the sign of q_p, q_c and q_e. Q/Qmax by default
+       Q/Qmax = 1-sum(A*S*exp(-lambda**2*tau)) with S sin(lambda)/lambda for walls, 2*J1(lambda)/lambda for cylinders and
+       3*(sin(lambda)-lambda*cos(lambda))/lambda**3 for spheres
+       returns Q for each time
+    """
+    lambdas = np.asarray(lambdas, dtype=float)
+    taus = tau(alfa, np.asarray(times, dtype=float), length)
+    instrumentation.terms(len(lambdas)*len(taus))
+    return qmax*(1-energy_coefficients(typ_, lambdas)@decay_matrix(lambdas, taus))
+
+
+
+def energy_coefficients(typ_:str, lambdas:List[float])->np.ndarray:
+    """
+       Weight of each term of the series in the mean gradient of the body (1-Q/Qmax), A*S in heat_transfer_history
+       typ_: Type of object 'p', 'c' or 'e'
+       lambdas: list of lambdas for the system
+    """
+    lambdas = np.asarray(lambdas, dtype=float)
+    if typ_ == 'p':
+        return amplitudes(typ_, lambdas)*_at_zero(lambdas, 1, lambda l: np.sin(l)/l)
+    if typ_ == 'e':
+        return amplitudes(typ_, lambdas)*_at_zero(lambdas, 1, lambda l: 3*(np.sin(l)-l*np.cos(l))/l**3)
+    return amplitudes(typ_, lambdas)*_at_zero(lambdas, 1, lambda l: 2*bessel_j01(l)[1]/l)
+
+
+
+def decay_matrix(lambdas:List[float], taus:List[float])->np.ndarray:
+    """
+       Time dependency of each term of the series: E[lambda, time] = exp(-lambda**2*tau)
+       lambdas: list of lambdas for the system
+       taus: adimensional times
+    """
+    lambdas = np.asarray(lambdas, dtype=float)
+    return np.exp(-np.outer(lambdas**2, np.asarray(taus, dtype=float)))
 
 
 
@@ -273,10 +850,7 @@ def gradient_p_coeff(lambdas:List[float], position:float, length:float)->float:
        position: distance relative to the center of the sphere
        length: half the length of the wall
     """
-    accummulated_gradientes = []
-    for i in lambdas:
-        accummulated_gradientes.append((4*sin(i))/(2*i+sin(2*i))*cos(i*position/length))
-    return accummulated_gradientes
+    return coefficient_matrix('p', lambdas, [position], length)[0].tolist()
 
 
 
@@ -287,13 +861,7 @@ def gradient_e_coeff(lambdas:List[float], position:float, radius:float)->float:
        position: distance relative to the center of the sphere
        radius: radius of the sphere
     """
-    accummulated_gradientes = []
-    for i in lambdas:
-        if position == 0:
-            accummulated_gradientes.append(4*(sin(i)-i*cos(i))/(2*i-sin(2*i))) # Avoid zero division limit
-        else:
-            accummulated_gradientes.append(4*(sin(i)-i*cos(i))/(2*i-sin(2*i))*sin(i*position/radius)/(i*position/radius))
-    return accummulated_gradientes
+    return coefficient_matrix('e', lambdas, [position], radius)[0].tolist()
 
 
 
@@ -304,10 +872,7 @@ def gradient_c_coeef(lambdas:List[float], position:float, radius:float)->float:
        position: distance relative to the center of the sphere
        radius: radius of the sphere
     """
-    accummulated_gradientes = []
-    for i in lambdas:
-        accummulated_gradientes.append(2/i*bessel(i, 1)/(bessel(i, 0)**2+bessel(i, 1)**2)*bessel(i*position/radius, 0))
-    return accummulated_gradientes
+    return coefficient_matrix('c', lambdas, [position], radius)[0].tolist()
 
 
 
@@ -319,6 +884,7 @@ def gradient_performant(coefficients:List[float], lambdas:List[float], tau:float
        lambdas: list of lambdas for the system
        tau: adimensional time 
     """
+    instrumentation.terms(len(coefficients))
     gradient = 0
     for i in range(len(coefficients)):
         gradient+=coefficients[i]*exp(-lambdas[i]**2*tau)
@@ -331,36 +897,481 @@ def temp_profiles(*, times:List[float], detailed:bool=False, **profiles)->Tuple[
     Create multiple temperature profiles from timestamps caching relevant data
     times: list with times to create profiles
     profiles: check temp_profile arguments
+    The coefficients C[coordinate, lambda] and the decay E[lambda, time] are built once and
+    every profile comes from the single product C@E. With a tolerance or the 'auto' regime each timestamp uses its own number of lambdas
     
     return coordinates and temperature profiles for each time
     """
-    assert times, "No timestamps provided"
-    coordinates = []
-    temperatures = []
-    
-    #Add firt timestamp to coordinates Compute lambdas alfa and biot just once
-    alfa, lambdas, biot_, coordinates, temp = temp_profile(time_=times[0], detailed=True, **profiles)
-    typ = {
-            'e': gradient_e_coeff,
-            'c': gradient_c_coeef,
-            'p': gradient_p_coeff,
-            
-          }
-    temperatures.append(temp)
-    profiles["alfa"] = alfa
-    profiles["lambdas_"] = lambdas
-    profiles["biot_"] = biot
-    profiles["coord"] = coordinates
-    profiles["performant_coeff"] = [typ[profiles["typ_"]](lambdas, coordinate, profiles["length"]) for coordinate in coordinates] #Obtain coefficients using the corresponding gradient function
-    for stamp in times[1:]:
-        _, temperatures_ = temp_profile(time_=stamp, **profiles)
-        temperatures.append(temperatures_)
+    assert len(times), "No timestamps provided"
+    instrumentation.count("temp_profiles")
+    with instrumentation.memory():
+        return _temp_profiles(times, detailed, profiles)
+
+
+
+def _temp_profiles(times:List[float], detailed:bool, profiles:dict)->Tuple[List[float], List[List[float]]]:
+    """Body of temp_profiles, separated to measure its peak memory"""
+    alfa, lambdas, biot_, coordinates, gradients, regimes = _evaluate(times, **profiles)
+    temperatures = temperature_g(gradients, profiles["st"], profiles["at"]).tolist()
     if detailed:
+        if profiles.get("regime", "series") != "series":
+            return alfa, lambdas, biot_, coordinates, temperatures, regimes
         return alfa, lambdas, biot_, coordinates, temperatures
     return coordinates, temperatures
 
 
 
+class ProfileSet:
+    """
+       Temperature profiles of a system backed by contiguous float64 arrays, about 4 times smaller than nested lists
+       coordinates: array of the coordinates
+       times: array of the timestamps
+       temperatures: array T[time, coordinate]
+       alfa, biot, lambdas and regimes of the system as in the detailed output of temp_profiles
+       It is also a sequence with the layout of the output of temp_profiles ((alfa, lambdas, biot,) coordinates, temperatures)
+       made of lists, so callers that index the tuple keep working (the lists are built once, on first use)
+    """
+    __slots__ = ("coordinates", "times", "temperatures", "alfa", "biot", "lambdas", "regimes", "detailed", "_legacy")
+
+    def __init__(self, coordinates:np.ndarray, times:np.ndarray, temperatures:np.ndarray, alfa:float, biot:float, lambdas:np.ndarray,\
+                 regimes:List[str]=None, detailed:bool=False):
+        self.coordinates = np.ascontiguousarray(coordinates, dtype=np.float64)
+        self.times = np.ascontiguousarray(times, dtype=np.float64)
+        self.temperatures = np.require(temperatures, np.float64, ["C"]) #Keeps memory maps (open_profiles)
+        self.alfa = alfa
+        self.biot = biot
+        self.lambdas = np.ascontiguousarray(lambdas, dtype=np.float64)
+        self.regimes = regimes
+        self.detailed = detailed
+        self._legacy = None
+
+
+    def profile(self, index:int)->np.ndarray:
+        """Temperatures of every coordinate at the timestamp of index, a view (no copy)"""
+        return self.temperatures[index]
+
+
+    def history(self, index:int)->np.ndarray:
+        """Temperatures of the coordinate of index at every timestamp, a view (no copy)"""
+        return self.temperatures[:, index]
+
+
+    def legacy(self)->tuple:
+        """Same output as temp_profiles, nested lists of floats"""
+        coordinates, temperatures = self.coordinates.tolist(), self.temperatures.tolist()
+        if not self.detailed:
+            return coordinates, temperatures
+        if self.regimes is not None:
+            return self.alfa, self.lambdas.tolist(), self.biot, coordinates, temperatures, self.regimes
+        return self.alfa, self.lambdas.tolist(), self.biot, coordinates, temperatures
+
+
+    def __len__(self)->int:
+        if not self.detailed:
+            return 2
+        return 5 if self.regimes is None else 6
+
+
+    def __getitem__(self, index):
+        if self._legacy is None:
+            self._legacy = self.legacy()
+        return self._legacy[index]
+
+
+    def __iter__(self):
+        return iter(self[:])
+
+
+    @property
+    def nbytes(self)->int:
+        """Memory of the arrays"""
+        return self.coordinates.nbytes+self.times.nbytes+self.temperatures.nbytes+self.lambdas.nbytes
+
+
+
+def profile_set(*, times:List[float], detailed:bool=False, **profiles)->ProfileSet:
+    """
+    Same as temp_profiles but the profiles are kept in a ProfileSet instead of lists
+    times: list with times to create profiles
+    detailed: layout of the ProfileSet when used as a sequence, alfa, biot and lambdas are always available as attributes
+    profiles: check temp_profile arguments
+    """
+    assert len(times), "No timestamps provided"
+    instrumentation.count("profile_set")
+    alfa, lambdas, biot_, coordinates, gradients, regimes = _evaluate(times, **profiles)
+    temperatures = np.ascontiguousarray(gradients)
+    temperatures *= profiles["st"]-profiles["at"] #temperature_g in place
+    temperatures += profiles["at"]
+    return ProfileSet(coordinates, times, temperatures, alfa, biot_, lambdas, None if profiles.get("regime", "series") == "series" else regimes,\
+                      detailed)
+
+
+
+def ambient_response(*, times:List[float], ambients:List[float], st:float, detailed:bool=False, **profiles)->ProfileSet:
+    """
+    Temperature profiles when the temperature of the surroundings changes with time (ramps and holds of a furnace)
+    times: uniform grid of times, the first one is the start of the process
+    ambients: temperature of the surroundings at each time, held until the next time
+    st: starting temperature of the object
+    detailed: layout of the ProfileSet when used as a sequence
+    profiles: check temp_profile arguments (at is not used, a tolerance is per degree of change of the surroundings)
+    Duhamel superposition: every change of the surroundings d_k at time t_k adds d_k*S(t-t_k), S = 1-gradient is the response
+    to a unit step with S(0) = 0. The sum over k is a discrete convolution over the whole grid done with FFTs (O(T log T))
+    and S is evaluated once for every time of the grid
+    Raises ValueError if the grid is not uniform
+    """
+    times = np.asarray(times, dtype=float)
+    ambients = np.asarray(ambients, dtype=float)
+    assert times.ndim == 1 and len(times), "No timestamps provided"
+    assert ambients.shape == times.shape, "An ambient temperature is needed for every time"
+    instrumentation.count("ambient_response")
+    elapsed = times-times[0]
+    if len(times)>1:
+        steps = np.diff(times)
+        if steps.min()<=0 or steps.max()-steps.min()>1e-9*steps.max():
+            raise ValueError("The times must be a uniform grid")
+        elapsed = np.arange(len(times))*steps.mean()
+    profiles.pop("at", None)
+    #The step has not had any effect yet at the first time, only the rest is evaluated
+    alfa, lambdas, biot_, coordinates, gradients, regimes = _evaluate(elapsed[1:], st=1, at=0, **profiles)
+    response = np.concatenate([np.zeros((1, len(coordinates))), 1-gradients.reshape(-1, len(coordinates))])
+    regime = profiles.get("regime", "series")
+    if regime != "series":
+        #Regime tau 0 would have been evaluated with
+        tolerance = profiles.get("tolerance")
+        start = "lumped" if _is_lumped(profiles["typ_"], biot_, regime, tolerance) else \
+                _plan(np.zeros(1), typ_=profiles["typ_"], st=1, at=0, nlambdas=profiles.get("nlambdas", 6), lambdas_=None,\
+                      tolerance=tolerance, regime=regime)[1][0]
+        regimes = [start]+regimes
+    changes = np.diff(ambients, prepend=st)
+    with instrumentation.phase("convolution"):
+        size = 1<<int(2*len(times)-1).bit_length()
+        convolution = np.fft.irfft(np.fft.rfft(response, size, axis=0)*np.fft.rfft(changes, size)[:, None], size, axis=0)
+    temperatures = st+convolution[:len(times)]
+    return ProfileSet(coordinates, times, temperatures, alfa, biot_, lambdas, None if regime == "series" else regimes, detailed)
+
+
+
+def evolve_profile(*, typ_:str, initial:List[float], initial_coord:List[float], at:float, length:float, times:List[float],\
+                   nlambdas:int=40, dx:float=None, cond:float=None, conv:float=None, alfa:float=None, biot_:float=None,\
+                   lambdas_:List[float]=None, coord:List[float]=None, cp:float=None, density:float=None, detailed:bool=False)->tuple:
+    """
+    Temperature profiles from a non-uniform starting profile, e.g. the one left by a previous process
+    initial: starting temperatures of the object
+    initial_coord: coordinates of the starting temperatures from the center to the surface, they may be non-uniform
+    nlambdas: number of lambdas used, they resolve details of the starting profile down to about length/nlambdas
+    check temp_profile for the rest of the arguments
+    The starting profile is projected once onto the eigenfunctions (modal_projection), each coefficient then decays as
+    exp(-lambda**2*tau) so every time comes from a single product
+    
+    return coordinates and temperature profiles for each time
+    with detailed also alfa, lambdas and biot as in temp_profiles
+    """
+    assert len(times), "No timestamps provided"
+    instrumentation.count("evolve_profile")
+    alfa, biot_sys, coordinates, lambdas = _system(typ_=typ_, length=length, nlambdas=nlambdas, dx=dx, cond=cond, conv=conv, alfa=alfa,\
+                                                   biot_=biot_, lambdas_=lambdas_, coord=coord, cp=cp, density=density)
+    with instrumentation.phase("coefficients"):
+        weights = modal_projection(typ_, lambdas, initial_coord, length)@(np.asarray(initial, dtype=float)-at)
+        coefficients = eigenfunctions(typ_, lambdas, coordinates, length)*weights
+    with instrumentation.phase("series"):
+        temperatures = (series(coefficients, lambdas, tau(alfa, np.asarray(times, dtype=float), length))+at).tolist()
+    if detailed:
+        return alfa, lambdas, biot_sys, coordinates, temperatures
+    return coordinates, temperatures
+
+
+
+def evaluate_points(*, positions:List[float], times:List[float], typ_:str, st:float, at:float, length:float, nlambdas:int=6,\
+                    cond:float=None, conv:float=None, alfa:float=None, biot_:float=None, lambdas_:List[float]=None, cp:float=None,\
+                    density:float=None, tolerance:float=None, regime:str="series")->np.ndarray:
+    """
+    Temperatures at scattered points, e.g. sensors at a few positions read at irregular times
+    positions: distances from the center
+    times: moments in time, broadcast with positions (pairs, or every combination with a column of times)
+    check temp_profile for the rest of the arguments
+    Only the requested pairs are computed: the coefficients of each distinct position (cached) times exp(-lambda**2*tau)
+    of its time, in a single pass. With a tolerance or the 'auto' regime each pair uses only the lambdas it needs
+    
+    returns the temperatures with the broadcast shape of positions and times
+    """
+    assert regime in REGIMES, f"Not supported. Supported regimes: {' '.join(REGIMES)}"
+    assert typ_ in LAMBDAS, f"Not supported. Supported types: {' '.join(list(LAMBDAS.keys()))}"
+    instrumentation.count("evaluate_points")
+    positions, times = np.broadcast_arrays(np.asarray(positions, dtype=float), np.asarray(times, dtype=float))
+    shape = positions.shape
+    positions = positions.ravel()
+    alfa = _diffusivity(alfa, cond, cp, density)
+    taus = tau(alfa, times.ravel(), length)
+    biot_sys = _biot(biot_, conv, length, cond)
+    if _is_lumped(typ_, biot_sys, regime, tolerance):
+        return temperature_g(lumped(typ_, biot_sys, taus), st, at).reshape(shape)
+    counts, regimes = _plan(taus, typ_=typ_, st=st, at=at, nlambdas=nlambdas, lambdas_=lambdas_, tolerance=tolerance, regime=regime)
+    summed = regimes != "semi-infinite"
+    alfa, biot_sys, _, lambdas = _system(typ_=typ_, length=length, nlambdas=int(max(counts[summed], default=0)) or 1, coord=[0], cond=cond,\
+                                         conv=conv, alfa=alfa, biot_=biot_sys, lambdas_=lambdas_, cp=cp, density=density)
+    lambdas = np.asarray(lambdas, dtype=float)
+    unique, index = np.unique(positions, return_inverse=True)
+    with instrumentation.phase("series"):
+        terms = cached_coefficients(typ_, lambdas, unique, length)[index]
+        terms = terms*np.exp(-np.outer(taus, lambdas**2))
+        if tolerance != None or regime != "series":
+            terms[np.arange(len(lambdas))>=np.minimum(counts, len(lambdas))[:, None]] = 0
+        instrumentation.terms(terms.size)
+        gradients = terms.sum(axis=1)
+        gradients[counts == 0] = 1 #tau 0 with a tolerance, nothing has changed yet
+    _short_times(typ_, biot_sys, positions/length, taus, regimes, gradients)
+    return temperature_g(gradients, st, at).reshape(shape)
+
+
+
+def product_profiles(*, shape:str, st:float, at:float, lengths:List[float], times:List[float], nlambdas:int=6, dx:float=None,\
+                     cond:float=None, conv:float=None, alfa:float=None, biots:List[float]=None, coords:List[List[float]]=None, cp:float=None,\
+                     density:float=None, tolerance:float=None, regime:str="series", dtype=np.float64, detailed:bool=False)->tuple:
+    """
+    Temperature fields of a multidimensional body as the product of the gradients of its 1D factors
+    shape: 'short-cylinder', 'bar' or 'brick', check SHAPES for the factors and the order of the lengths
+    lengths: characteristic length of each factor (radius or half the side)
+    times: list with times to create fields
+    biots: biot of each factor, if not provided conv and cond must be provided
+    coords: list of coordinates for each factor, if not provided dx must be provided
+    dtype: type of the returned array, np.float32 halves the memory of large fields
+    check temp_profile for the rest of the arguments
+    Each factor is evaluated once for every time (factors with the same system are shared) and the field comes from
+    their outer product G1[time, x1]*G2[time, x2]*...
+    
+    returns coordinates of each factor and the fields T[time, x1, x2(, x3)]
+    with detailed also alfa, the biots and the lambdas of each factor
+    """
+    assert shape in SHAPES, f"Not supported. Supported shapes: {' '.join(list(SHAPES.keys()))}"
+    assert len(times), "No timestamps provided"
+    factors = SHAPES[shape]
+    assert len(lengths) == len(factors), f"A {shape} needs {len(factors)} lengths"
+    instrumentation.count("product_profiles")
+    biots = [None]*len(factors) if biots is None else biots
+    coords = [None]*len(factors) if coords is None else coords
+    solved = {}
+    coordinates, gradients, lambdas, biots_sys = [], [], [], []
+    for typ_, length, biot_, coord in zip(factors, lengths, biots, coords):
+        key = (typ_, length, biot_, None if coord is None else tuple(coord))
+        if key not in solved:
+            solved[key] = _evaluate(times, typ_=typ_, st=st, at=at, length=length, nlambdas=nlambdas, dx=dx, cond=cond, conv=conv,\
+                                    alfa=alfa, biot_=biot_, lambdas_=None, coord=coord, cp=cp, density=density, tolerance=tolerance,\
+                                    regime=regime)
+        alfa_sys, lambdas_, biot_sys, coordinates_, gradients_, _ = solved[key]
+        coordinates.append(coordinates_)
+        gradients.append(gradients_)
+        lambdas.append(lambdas_)
+        biots_sys.append(biot_sys)
+    temperatures = gradients[0].astype(dtype)
+    for gradient in gradients[1:]:
+        temperatures = temperatures[..., None]*gradient.astype(dtype).reshape((len(times),)+(1,)*(temperatures.ndim-1)+(-1,))
+    #temperature_g in place, the field is the largest array
+    temperatures *= st-at
+    temperatures += at
+    if detailed:
+        return alfa_sys, biots_sys, lambdas, coordinates, temperatures
+    return coordinates, temperatures
+
+
+
+def iter_temp_profiles(*, times:Iterable[float], chunk:int=None, **profiles)->Iterator[tuple]:
+    """
+    Generate temperature profiles lazily, useful for long time series that should not be held in memory
+    times: iterable with times to create profiles, it can be a generator itself
+    chunk: when given the profiles are produced in groups of this many timestamps
+    profiles: check temp_profile arguments (detailed is not accepted)
+    The lambdas and coefficients are resolved with the first timestamps and reused, they are only solved again if later
+    timestamps need more lambdas (tolerance or 'auto' regime)
+    
+    yields (time, temperatures) or, with chunk, (times, temperature profiles) with at most chunk timestamps
+    """
+    assert chunk is None or chunk>0, "The chunk must be positive"
+    instrumentation.count("iter_temp_profiles")
+    for block, evaluation in _blocks(times, chunk or 1, profiles):
+        temperatures = temperature_g(evaluation[4], profiles["st"], profiles["at"]).tolist()
+        if chunk is None:
+            yield block[0], temperatures[0]
+        else:
+            yield block, temperatures
+
+
+
+def _blocks(times:Iterable[float], chunk:int, profiles:dict)->Iterator[tuple]:
+    """
+    Evaluate groups of chunk timestamps resolving the system only once (or when more lambdas are needed)
+    yields each group of times and the output of _evaluate for them
+    """
+    timestamps = iter(times)
+    resolved = None
+    while True:
+        block = list(islice(timestamps, chunk))
+        if not block:
+            return
+        if resolved is not None and len(resolved["lambdas_"]):
+            counts, regimes = _plan(tau(resolved["alfa"], np.asarray(block, dtype=float), profiles["length"]), typ_=profiles["typ_"],\
+                                    st=profiles["st"], at=profiles["at"], nlambdas=profiles.get("nlambdas", 6), lambdas_=profiles.get("lambdas_"),\
+                                    tolerance=profiles.get("tolerance"), regime=profiles.get("regime", "series"))
+            if max(counts[regimes != "semi-infinite"], default=0)>len(resolved["lambdas_"]):
+                resolved = None
+        if resolved is None:
+            evaluation = _evaluate(block, **profiles)
+            alfa, lambdas, biot_, coordinates = evaluation[:4]
+            resolved = dict(profiles, alfa=alfa, biot_=biot_, coord=coordinates, lambdas_=lambdas)
+            if len(lambdas):
+                resolved["performant_coeff"] = cached_coefficients(profiles["typ_"], lambdas, coordinates, profiles["length"])
+        else:
+            evaluation = _evaluate(block, **resolved)
+        yield block, evaluation
+
+
+
+def write_profiles(path:str, *, times:List[float], chunk:int=1024, **profiles)->str:
+    """
+    Compute the temperature profiles by groups of timestamps straight into a memory-mapped .npy file, the memory used is bounded by
+    chunk whatever the number of timestamps
+    path: .npy file for the temperatures T[time, coordinate], a header with the inputs, alfa, biot, lambdas, coordinates, times
+    and regimes is written next to it (header_path)
+    times: list with times to create profiles
+    chunk: number of timestamps computed at a time
+    profiles: check temp_profile arguments
+    Use open_profiles to read it back
+    
+    returns path
+    """
+    assert len(times), "No timestamps provided"
+    assert chunk>0, "The chunk must be positive"
+    instrumentation.count("write_profiles")
+    temperatures = None
+    start = 0
+    regimes = []
+    for block, (alfa, lambdas, biot_, coordinates, gradients, regimes_) in _blocks(times, chunk, profiles):
+        if temperatures is None:
+            temperatures = np.lib.format.open_memmap(path, mode="w+", dtype=np.float64, shape=(len(times), len(coordinates)))
+        temperatures[start:start+len(block)] = temperature_g(gradients, profiles["st"], profiles["at"])
+        start += len(block)
+        regimes.extend(regimes_)
+    temperatures.flush()
+    del temperatures
+    inputs = {key:(value.tolist() if isinstance(value, np.ndarray) else value) for key, value in profiles.items() if key != "performant_coeff"}
+    header = {"inputs":inputs, "alfa":alfa, "biot":biot_, "lambdas":[float(l) for l in lambdas], "coordinates":[float(c) for c in coordinates],\
+              "times":[float(t) for t in times], "regimes":None if profiles.get("regime", "series") == "series" else regimes}
+    with open(header_path(path), "w") as file:
+        json.dump(header, file)
+    return path
+
+
+
+def open_profiles(path:str, detailed:bool=False)->ProfileSet:
+    """
+    Reopen the profiles written by write_profiles, the temperatures stay on disk and are only read when sliced
+    path: .npy file of the temperatures
+    detailed: layout of the ProfileSet when used as a sequence
+    """
+    with open(header_path(path)) as file:
+        header = json.load(file)
+    temperatures = np.load(path, mmap_mode="r")
+    return ProfileSet(header["coordinates"], header["times"], temperatures, header["alfa"], header["biot"], header["lambdas"],\
+                      header["regimes"], detailed)
+
+
+
+def header_path(path:str)->str:
+    """Location of the header of a file written by write_profiles"""
+    return os.path.splitext(path)[0]+".json"
+
+
+
+def time_to_temperature(*, typ_:str, st:float, at:float, length:float, targets:List[float], positions:List[float], nlambdas:int=40,\
+                        cond:float=None, conv:float=None, alfa:float=None, biot_:float=None, lambdas_:List[float]=None, cp:float=None,\
+                        density:float=None, tolerance:float=1e-10, maxiter:int=100)->np.ndarray:
+    """
+    Time when each target temperature is reached at its position, the inverse of temp_profiles
+    targets: temperatures to reach
+    positions: distances from the center, they are broadcast with targets (pairs or every combination with a column of targets)
+    nlambdas: number of lambdas of the series, more lambdas resolve earlier times (tau of roughly 20/(nlambdas*pi)**2)
+    tolerance: relative size of the last correction of the time
+    maxiter: maximum number of iterations, raises StopIteration
+    check temp_profile for the rest of the arguments
+    The gradient of every point decreases from 1 to 0 so each query has a single crossing, it is found at once for all the queries
+    with Newton's method on log(tau) using d(gradient)/d(tau) = -sum(C*lambda**2*exp(-lambda**2*tau)), whenever a step leaves
+    the bracket of the crossing it is replaced by bisection.
+    Raises ValueError if a target is never reached or is reached before the series is accurate
+    
+    returns the times with the broadcast shape of targets and positions
+    """
+    instrumentation.count("time_to_temperature")
+    assert st != at, "The temperature does not change when st == at"
+    targets, positions = np.broadcast_arrays(np.asarray(targets, dtype=float), np.asarray(positions, dtype=float))
+    shape = targets.shape
+    goals = ((targets-at)/(st-at)).ravel()
+    if np.any((goals>=1)|(goals<=0)):
+        raise ValueError("Targets must be between the starting temperature and the temperature of the surroundings")
+    unique, index = np.unique(positions.ravel(), return_inverse=True)
+    alfa = _diffusivity(alfa, cond, cp, density)
+    alfa, biot_sys, coordinates, lambdas = _system(typ_=typ_, length=length, nlambdas=nlambdas, dx=None, cond=cond, conv=conv, alfa=alfa,\
+                                                   biot_=biot_, lambdas_=lambdas_, coord=unique.tolist(), cp=cp, density=density)
+    lambdas = np.asarray(lambdas, dtype=float)
+    coefficients = cached_coefficients(typ_, lambdas, coordinates, length)[index]
+    squares = lambdas**2
+    
+    def gradient(taus:np.ndarray, rows:np.ndarray)->Tuple[np.ndarray, np.ndarray]:
+        terms = coefficients[rows]*np.exp(-np.outer(taus, squares))
+        instrumentation.terms(terms.size)
+        return terms.sum(axis=1), -(terms*squares).sum(axis=1)
+    
+    #Bracket in log(tau): the series is accurate from the lower end on and the gradient decays as exp(-lambda1**2*tau)
+    everything = np.arange(len(goals))
+    lower = np.full(len(goals), np.log(np.log(2/1e-6)/(len(lambdas)*pi)**2))
+    value, _ = gradient(np.exp(lower), everything)
+    if np.any(value<=goals):
+        raise ValueError("Targets are reached before the series is accurate, use more lambdas")
+    upper = lower.copy()
+    value = np.ones(len(goals))
+    while np.any(value>goals):
+        upper = np.where(value>goals, upper+np.log(4), upper)
+        value, _ = gradient(np.exp(upper), everything)
+        if np.any(upper>np.log(1e6)):
+            raise ValueError("Targets are never reached")
+    found = (lower+upper)/2
+    active = everything
+    for i in range(maxiter):
+        x = found[active]
+        value, slope = gradient(np.exp(x), active)
+        value -= goals[active]
+        above = value>0 #Still before the crossing
+        lower[active] = np.where(above, x, lower[active])
+        upper[active] = np.where(above, upper[active], x)
+        lo, hi = lower[active], upper[active]
+        derivative = slope*np.exp(x) #d(gradient)/d(log(tau))
+        step = np.where((value == 0)|(derivative == 0), x, x-value/np.where(derivative == 0, 1, derivative))
+        outside = ~((step>=lo)&(step<=hi)) | (derivative == 0)&(value != 0)
+        step[outside] = (lo[outside]+hi[outside])/2
+        found[active] = step
+        done = (np.abs(step-x)<=tolerance)|(hi-lo<=tolerance)|(value == 0)
+        active = active[~done]
+        if not active.size:
+            break
+    else:
+        raise StopIteration("Maximum number of iterations reached and no time was found")
+    return (np.exp(found)*length**2/alfa).reshape(shape)
+
+
+
+# Coefficient matrices shared by every call
+COEFFICIENTS = CoefficientCache()
+
+
+
+# Solver of the lambdas by type of object
+LAMBDAS = {
+            'e': e_lambdas,
+            'c': c_lambdas,
+            'p': p_lambdas,
+}
+
+
+
 if __name__ == "__main__":
     #print(temp_profile(typ_='p', st=20, at=500, length=2, cond=110, conv=120, time_=800, dx=0.005, nlambdas=10, alfa=33.9e-6))
     #print(temp_profile(typ_='e', st=20, at=500, length=0.2, cond=110, conv=120, time_=420, dx=0.005, nlambdas=10, alfa=33.9e-6))
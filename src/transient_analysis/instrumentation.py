@@ -0,0 +1,151 @@
+"""
+Fernando Jose Lavarreda Urizar
+Opt-in instrumentation for Transient Analysis
+Call counts, Newton iterations per root, Bessel evaluations, terms summed, time per phase and peak memory
+
+Collection is off by default and every hook returns immediately. It is turned on with the collect context manager
+or for the whole process with the environment variable TRANSIENT_ANALYSIS_PROFILE=1 (see report())
+"""
+
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterator, Optional
+import numpy as np
+
+
+ENVIRONMENT = "TRANSIENT_ANALYSIS_PROFILE"
+_OFF = nullcontext()
+
+
+
+class Report:
+    """Measurements gathered while collection is on"""
+
+    def __init__(self):
+        self.calls:Dict[str, int] = {}
+        self.iterations:Dict[int, int] = {} #Newton iterations -> number of roots that needed them
+        self.bessel_evaluations = 0
+        self.terms = 0
+        self.phases:Dict[str, list] = {} #name -> [calls, seconds]
+        self.peak_memory:Optional[int] = None
+
+
+    def as_dict(self)->dict:
+        """Structured version of the report, only built-in types so it can be logged as JSON"""
+        roots = sum(self.iterations.values())
+        total = sum(iterations*roots_ for iterations, roots_ in self.iterations.items())
+        return {
+                "calls":dict(self.calls),
+                "newton":{
+                            "roots":roots,
+                            "iterations":total,
+                            "mean":total/roots if roots else 0,
+                            "max":max(self.iterations) if self.iterations else 0,
+                            "histogram":dict(sorted(self.iterations.items())),
+                        },
+                "bessel_evaluations":self.bessel_evaluations,
+                "terms":self.terms,
+                "phases":{name:{"calls":calls, "seconds":seconds} for name, (calls, seconds) in self.phases.items()},
+                "peak_memory":self.peak_memory,
+               }
+
+
+
+_report:Optional[Report] = Report() if os.environ.get(ENVIRONMENT, "") not in ("", "0") else None
+
+
+
+def report()->Optional[Report]:
+    """Report being filled, None when collection is off"""
+    return _report
+
+
+
+@contextmanager
+def collect()->Iterator[Report]:
+    """Turn collection on for the enclosed block
+       yields the Report that is filled while the block runs
+    """
+    global _report
+    previous = _report
+    _report = Report()
+    try:
+        yield _report
+    finally:
+        _report = previous
+
+
+
+def count(name:str, amount:int=1)->None:
+    """Add calls to a function"""
+    if _report is not None:
+        _report.calls[name] = _report.calls.get(name, 0)+amount
+
+
+
+def iterations(per_root)->None:
+    """Record the Newton iterations used by each root"""
+    if _report is not None:
+        values, counts = np.unique(np.asarray(per_root, dtype=int), return_counts=True)
+        for value, counted in zip(values.tolist(), counts.tolist()):
+            _report.iterations[value] = _report.iterations.get(value, 0)+counted
+
+
+
+def bessel(evaluations:int)->None:
+    """Record the number of points where J0 and J1 were evaluated"""
+    if _report is not None:
+        _report.bessel_evaluations += evaluations
+
+
+
+def terms(amount:int)->None:
+    """Record the number of series terms summed"""
+    if _report is not None:
+        _report.terms += amount
+
+
+
+def phase(name:str):
+    """Context manager adding the wall time of its block to a phase"""
+    if _report is None:
+        return _OFF
+    return _phase(_report, name)
+
+
+
+@contextmanager
+def _phase(report_:Report, name:str)->Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        calls, seconds = report_.phases.get(name, (0, 0.0))
+        report_.phases[name] = [calls+1, seconds+time.perf_counter()-start]
+
+
+
+def memory():
+    """Context manager that records the peak memory of its block, tracemalloc is only started while collecting"""
+    if _report is None:
+        return _OFF
+    return _memory(_report)
+
+
+
+@contextmanager
+def _memory(report_:Report)->Iterator[None]:
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    if hasattr(tracemalloc, "reset_peak"): #Python 3.9, before it the peak of an outer trace includes what came before
+        tracemalloc.reset_peak()
+    try:
+        yield
+    finally:
+        peak = tracemalloc.get_traced_memory()[1]
+        if started:
+            tracemalloc.stop()
+        report_.peak_memory = max(peak, report_.peak_memory or 0)
@@ -0,0 +1,152 @@
+"""
+Fernando Jose Lavarreda Urizar
+Surrogate of the gradient of a system for fast queries at scattered points
+Tensor Chebyshev fit in the relative position x/L and log(tau), its cost does not depend on the number of lambdas
+
+The fit is checked against the series on a grid between its nodes and its degree doubled until the error is below
+the tolerance, the error found is kept as the bound of the surrogate
+"""
+
+import json
+import numpy as np
+from typing import List, Tuple
+from numpy.polynomial import chebyshev
+from . import instrumentation
+from .ganalysis import LAMBDAS, MAX_LAMBDAS, coefficient_matrix, series, temperature_g, terms_needed
+
+
+MAX_DEGREE = 256
+
+
+
+class Surrogate:
+    """
+       Gradient (tx-at)/(st-at) of an object with a given biot as a Chebyshev series in x/L and log(tau)
+       typ_: Type of object 'p', 'c' or 'e'
+       biot: biot of the system
+       tau_range: adimensional times covered, queries outside of it raise ValueError
+       coefficients: array C[degree x/L, degree log(tau)]
+       error: largest difference with the series found while validating the fit
+    """
+
+    def __init__(self, typ_:str, biot:float, tau_range:Tuple[float, float], coefficients:np.ndarray, error:float):
+        self.typ_ = typ_
+        self.biot = biot
+        self.tau_range = (float(tau_range[0]), float(tau_range[1]))
+        self.coefficients = np.asarray(coefficients, dtype=float)
+        self.error = error
+
+
+    @classmethod
+    def build(cls, typ_:str, biot:float, tau_range:Tuple[float, float]=(1e-3, 10), tolerance:float=1e-6, degrees:Tuple[int, int]=(16, 16),\
+              max_degree:int=MAX_DEGREE)->"Surrogate":
+        """
+        Fit the surrogate of a system
+        tolerance: largest error of the gradient accepted
+        degrees: starting number of nodes in x/L and log(tau), doubled where the error is larger than the tolerance
+        max_degree: most nodes in each direction, raises ValueError if the tolerance is not met with them
+        """
+        assert 0<tau_range[0]<tau_range[1], "The range of tau must be positive and increasing"
+        instrumentation.count("Surrogate.build")
+        nlambdas = int(min(terms_needed([tau_range[0]], tolerance/10)[0], MAX_LAMBDAS))
+        lambdas = LAMBDAS[typ_](biot, nlambdas)
+        surrogate = cls(typ_, biot, tau_range, np.zeros((1, 1)), np.inf)
+        nx, nt = degrees
+        while True:
+            positions, logs = _nodes(nx), _nodes(nt)
+            values = _series(typ_, lambdas, surrogate._positions(positions), surrogate._taus(logs))
+            #The Vandermonde matrices at the Chebyshev nodes are well conditioned
+            surrogate.coefficients = np.linalg.solve(chebyshev.chebvander(positions, nx-1),\
+                                                     np.linalg.solve(chebyshev.chebvander(logs, nt-1), values.T).T)
+            #Validation between the nodes
+            check_x, check_t = _midpoints(positions), _midpoints(logs)
+            exact = _series(typ_, lambdas, surrogate._positions(check_x), surrogate._taus(check_t))
+            fitted = chebyshev.chebvander(check_x, nx-1)@surrogate.coefficients@chebyshev.chebvander(check_t, nt-1).T
+            surrogate.error = float(np.abs(fitted-exact).max())
+            if surrogate.error<=tolerance:
+                return surrogate
+            #The last coefficients of each direction estimate how much its truncation costs
+            coefficients = np.abs(surrogate.coefficients)
+            grow_x = coefficients[-2:].max()>=coefficients[:, -2:].max()
+            if (nx if grow_x else nt)*2>max_degree:
+                grow_x = not grow_x
+                if (nx if grow_x else nt)*2>max_degree:
+                    raise ValueError(f"Tolerance not met with {max_degree} nodes, error {surrogate.error}")
+            if grow_x:
+                nx *= 2
+            else:
+                nt *= 2
+
+
+    def __call__(self, positions:np.ndarray, taus:np.ndarray)->np.ndarray:
+        """
+        Gradients at scattered points
+        positions: coordinates divided by the length (0 center, 1 surface)
+        taus: adimensional times, broadcast with positions
+        """
+        positions, taus = np.broadcast_arrays(np.asarray(positions, dtype=float), np.asarray(taus, dtype=float))
+        if np.any((positions<0)|(positions>1)):
+            raise ValueError("Positions must be between 0 and 1")
+        if np.any((taus<self.tau_range[0])|(taus>self.tau_range[1])):
+            raise ValueError(f"Taus must be inside {self.tau_range}")
+        x = 2*positions.ravel()-1
+        low, high = np.log(self.tau_range)
+        t = (2*np.log(taus.ravel())-low-high)/(high-low)
+        nx, nt = self.coefficients.shape
+        #Each point only needs its row of x polynomials against the table of coefficients
+        values = np.einsum("pi,ij,pj->p", chebyshev.chebvander(x, nx-1), self.coefficients, chebyshev.chebvander(t, nt-1), optimize=True)
+        return values.reshape(positions.shape)
+
+
+    def temperatures(self, coordinates:np.ndarray, times:np.ndarray, *, st:float, at:float, alfa:float, length:float)->np.ndarray:
+        """Temperatures at scattered coordinates and times of a system with this biot"""
+        return temperature_g(self(np.asarray(coordinates, dtype=float)/length, alfa*np.asarray(times, dtype=float)/length**2), st, at)
+
+
+    def to_dict(self)->dict:
+        """Built-in types only, so it can be stored as JSON"""
+        return {"typ_":self.typ_, "biot":self.biot, "tau_range":list(self.tau_range), "coefficients":self.coefficients.tolist(),\
+                "error":self.error}
+
+
+    @classmethod
+    def from_dict(cls, data:dict)->"Surrogate":
+        return cls(data["typ_"], data["biot"], data["tau_range"], data["coefficients"], data["error"])
+
+
+    def save(self, path:str)->None:
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file)
+
+
+    @classmethod
+    def load(cls, path:str)->"Surrogate":
+        with open(path) as file:
+            return cls.from_dict(json.load(file))
+
+
+    def _positions(self, x:np.ndarray)->np.ndarray:
+        return (x+1)/2
+
+
+    def _taus(self, t:np.ndarray)->np.ndarray:
+        low, high = np.log(self.tau_range)
+        return np.exp((t*(high-low)+low+high)/2)
+
+
+
+def _nodes(n:int)->np.ndarray:
+    """Chebyshev points of the first kind in [-1, 1]"""
+    return np.cos(np.pi*(np.arange(n)+0.5)/n)[::-1]
+
+
+
+def _midpoints(nodes:np.ndarray)->np.ndarray:
+    """Points halfway between the nodes and the ends of the interval, where the fit is the least accurate"""
+    return np.concatenate([[-1], (nodes[:-1]+nodes[1:])/2, [1]])
+
+
+
+def _series(typ_:str, lambdas:List[float], positions:np.ndarray, taus:np.ndarray)->np.ndarray:
+    """Gradients G[position, tau] of the series"""
+    return series(coefficient_matrix(typ_, lambdas, positions, 1), lambdas, taus).T
@@ -0,0 +1,90 @@
+"""
+Fernando Jose Lavarreda Urizar
+Parameter sweeps for Transient Analysis
+Temperature profiles for every combination of geometry, biot, diffusivity and length in parallel processes
+
+The lambdas are solved once per geometry for every biot (lambdas_batch) and each process receives blocks of biots,
+it returns a single array for its block so no lists are pickled per case
+"""
+
+import numpy as np
+from typing import Dict, List
+from concurrent.futures import ProcessPoolExecutor
+from . import instrumentation
+from .zeros import lambdas_batch
+from .ganalysis import coefficient_matrix, series, temperature_g
+
+
+AXES = ("geometry", "biot", "alfa", "length", "time", "position")
+
+
+
+class Sweep:
+    """Labeled result of a sweep, values[geometry, biot, alfa, length, time, position]"""
+
+    def __init__(self, values:np.ndarray, axes:Dict[str, list]):
+        self.values = values
+        self.axes = axes
+
+
+    def sel(self, **labels)->np.ndarray:
+        """Select by the value of the labels, e.g. sel(geometry='c', biot=5), the axes not given are kept"""
+        index = []
+        for name in AXES:
+            if name in labels:
+                index.append(self.axes[name].index(labels.pop(name)))
+            else:
+                index.append(slice(None))
+        assert not labels, f"Nonexistent axes: {' '.join(labels)}, axes: {' '.join(AXES)}"
+        return self.values[tuple(index)]
+
+
+
+def sweep(*, geometries:List[str], biots:List[float], alfas:List[float], lengths:List[float], times:List[float], positions:List[float],\
+          st:float, at:float, nlambdas:int=6, workers:int=None, chunk:int=16)->Sweep:
+    """
+    Temperature profiles for the Cartesian product of the parameters
+    geometries: types of object 'p', 'c' or 'e'
+    biots: biots of the systems (materials and convection constants are given through them)
+    alfas: thermal diffusivities
+    lengths: half the length of the wall or radius of the cylinder or sphere
+    times: moments in time
+    positions: distances relative to the length (0 center, 1 surface) where to compute temperatures
+    st: starting temperature of the objects
+    at: temperature of the surroundings
+    nlambdas: number of lambdas of the series
+    workers: number of processes, None uses every core and 0 computes in this process
+    chunk: number of biots given to a process at a time
+
+    returns a Sweep with values[geometry, biot, alfa, length, time, position]
+    """
+    assert chunk>0, "The chunk must be positive"
+    instrumentation.count("sweep")
+    axes = {"geometry":list(geometries), "biot":list(biots), "alfa":list(alfas), "length":list(lengths), "time":list(times),\
+            "position":list(positions)}
+    #Adimensional times for every alfa, length and time
+    taus = (np.asarray(alfas, dtype=float)[:, None, None]*np.asarray(times, dtype=float)[None, None, :]\
+            /np.asarray(lengths, dtype=float)[None, :, None]**2).ravel()
+    unique, inverse = np.unique(np.asarray(biots, dtype=float), return_inverse=True)
+    tasks = []
+    for typ_ in geometries:
+        with instrumentation.phase("lambdas"):
+            lambdas = lambdas_batch(typ_, unique, nlambdas)
+        for start in range(0, len(unique), chunk):
+            tasks.append((typ_, lambdas[start:start+chunk], positions, taus))
+    if workers == 0:
+        blocks = [_block(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            blocks = list(executor.map(_block, *zip(*tasks)))
+    gradients = np.concatenate(blocks).reshape(len(geometries), len(unique), len(alfas), len(lengths), len(times), len(positions))
+    return Sweep(temperature_g(gradients[:, inverse], st, at), axes)
+
+
+
+def _block(typ_:str, lambdas:np.ndarray, positions:List[float], taus:np.ndarray)->np.ndarray:
+    """Gradients G[biot, tau, position] of a block of biots, runs in the worker processes"""
+    gradients = np.empty((len(lambdas), len(taus), len(positions)))
+    for i, lambdas_ in enumerate(lambdas):
+        gradients[i] = series(coefficient_matrix(typ_, lambdas_, positions, 1), lambdas_, taus)
+    return gradients
@@ -7,52 +7,116 @@ Example of call to the program:
     -e 10 2: this means sphere biot = 10 and 2 find two zeros
     -11: This shows Bessel functions from [0, 10], a higher value will be truncated to 11.
     
+    -table p: this builds the on-disk eigenvalue table for walls, used afterwards by p_lambdas
+    
 Codes:
     e = sphere, max biot 100_000.
     p = wall, max biot 100_000.
-    c = cylinder, max biot 100. Max zeros 7 else truncated
+    c = cylinder, no limit for biot or zeros.
 """
 
+import os
 import sys
-from functools import partial
-from typing import List, Callable
-from math import sin, cos, tan, factorial, pi
+import numpy as np
+from typing import List, Callable, Tuple, Union
+from math import factorial, pi
+try:
+    from . import instrumentation
+except ImportError:
+    #Run as a script (python zeros.py ...), the package is found from the folder that contains it
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from transient_analysis import instrumentation
 
 
 # Program limitations
 MAX_BIOTE = 100_000
 MAX_BIOTP = 100_000
-MAX_BIOTC = 100
-MAX_LAMBDASC = 7
+
+# Bessel evaluation, below the switch the power series is used above it Hankel's asymptotic expansion
+BESSEL_SWITCH = 12
+BESSEL_SERIES_TERMS = 45
+BESSEL_ASYMPTOTIC_TERMS = 20
+
+# Eigenvalue tables, lambdas stored over a log spaced biot grid
+TABLE_DIR = os.environ.get("TRANSIENT_ANALYSIS_TABLES", os.path.join(os.path.expanduser("~"), ".transient_analysis"))
+TABLE_MIN_BIOT = 1e-4
+TABLE_POINTS_DECADE = 100
+TABLE_POLISH = 2
+_TABLES = {} #Loaded tables by geometry, None when there is no table on disk
+
 
 def pared(lamb:float, biot:float)->float:
     """Function that defines the relationship between the biot and lambda for a wall"""
-    return lamb*tan(lamb)-biot
+    return lamb*np.tan(lamb)-biot
 
 
 def dpared(lamb:float)->float:
     """Derivative of pared function"""
-    return tan(lamb)+lamb*1/(cos(lamb)**2)
+    return np.tan(lamb)+lamb*1/(np.cos(lamb)**2)
 
 
 def cilindro(lamb:float, biot:float)->float:
     """Function that defines the relationship between biot and lamda for a cylinders"""
-    return lamb*(bessel(lamb, 1)/bessel(lamb, 0))-biot
+    j0, j1 = bessel_j01(lamb)
+    return lamb*(j1/j0)-biot
 
 
 def dcilindro(lamb:float)->float:
-    """Derivative of cilindro function"""
-    return (bessel(lamb, 1)/bessel(lamb, 0))+lamb*derivar(lamb, lambda x: (bessel(x, 1)/bessel(x, 0)))
+    """Derivative of cilindro function, closed form using J0' = -J1 and J1' = J0-J1/x"""
+    j0, j1 = bessel_j01(lamb)
+    return lamb*(1+(j1/j0)**2)
 
 
 def esfera(lamb:float, biot:float)->float:
     """Function that defines the relationship between biot anda lamda for a sphere"""
-    return 1-lamb/tan(lamb)-biot
+    return 1-lamb/np.tan(lamb)-biot
 
 
 def desfera(lamb)->float:
     """Derivative of esfera function"""
-    return -1/tan(lamb)+lamb/(sin(lamb)**2)
+    return -1/np.tan(lamb)+lamb/(np.sin(lamb)**2)
+
+
+def pared_regular(lamb:float, biot:float)->float:
+    """Wall relationship multiplied by cos(lamb) to remove its poles: lamb*sin(lamb)-biot*cos(lamb)"""
+    return lamb*np.sin(lamb)-biot*np.cos(lamb)
+
+
+def dpared_regular(lamb:float, biot:float)->float:
+    """Derivative of pared_regular function"""
+    return (1+biot)*np.sin(lamb)+lamb*np.cos(lamb)
+
+
+def cilindro_regular(lamb:float, biot:float)->float:
+    """Cylinder relationship multiplied by J0(lamb) to remove its poles: lamb*J1(lamb)-biot*J0(lamb)"""
+    j0, j1 = bessel_j01(lamb)
+    return lamb*j1-biot*j0
+
+
+def dcilindro_regular(lamb:float, biot:float)->float:
+    """Derivative of cilindro_regular function"""
+    j0, j1 = bessel_j01(lamb)
+    return lamb*j0+biot*j1
+
+
+def esfera_regular(lamb:float, biot:float)->float:
+    """Sphere relationship multiplied by sin(lamb) to remove its poles: (1-biot)*sin(lamb)-lamb*cos(lamb)
+       sin(lamb)-lamb*cos(lamb) is summed as a series for small lambdas to avoid cancellation
+    """
+    lamb = np.asarray(lamb, dtype=float)
+    l2 = lamb*lamb
+    series = np.zeros_like(lamb)
+    term = lamb*l2/3
+    for k in range(1, 9):
+        series += term
+        term = -term*l2/(2*k*(2*k+3))
+    regular = np.where(np.abs(lamb)<1, series, np.sin(lamb)-lamb*np.cos(lamb))
+    return regular-biot*np.sin(lamb)
+
+
+def desfera_regular(lamb:float, biot:float)->float:
+    """Derivative of esfera_regular function"""
+    return lamb*np.sin(lamb)-biot*np.cos(lamb)
 
 
 def newtons(fn:Callable[[float], float], dx:Callable[[float], float], xo:float, tolerancia:float=0.000001, maxiter:int=10000)->List[float]:
@@ -64,12 +128,14 @@ def newtons(fn:Callable[[float], float], dx:Callable[[float], float], xo:float,
     maxiter: maximum value of iterations before exiting function if zero has not been found Default value set to 10000 iterations, raises StopIteration
     returns a tuple with the zero and number of iterations
     """
+    instrumentation.count("newtons")
     i = 0
     while abs(fn(xo))>tolerancia:
         xo -= fn(xo)/dx(xo)
         i+=1
         if i>=maxiter:
             raise StopIteration("Maximum number of iterations reached and no zero was found")
+    instrumentation.iterations([i])
     return xo, i
 
 
@@ -95,10 +161,13 @@ def multiple_newtons(fn:Callable[[float], float], dx:Callable[[float], float], x
 
 def bessel(x:float, degree:int, terms:int=120)->float:
     """Definition of Bessel function
-       x: point of evaluation for bessel function. For 120 terms 35 is max value to evaluate with semi accurate results
-       degree: degree of bessel function to evaluate. Value shouldn't be more than 10/11 for a regular computer
-       terms: number of terms to use in bessel function calculation. Big terms value may cause OverflowError
+       x: point of evaluation for bessel function
+       degree: degree of bessel function to evaluate. Degrees 0 and 1 are computed by bessel_j01 and are accurate for any x,
+       for other degrees a series is used where 35 is max value to evaluate with semi accurate results and degree shouldn't be more than 10/11
+       terms: number of terms to use in the series for degrees other than 0 and 1. Big terms value may cause OverflowError
     """
+    if degree in (0, 1):
+        return float(bessel_j01(x)[degree])
     if x>35:
         return sum([(x/2)**(i)*((-1)**i)/factorial(i)*(x/2)**(degree)/factorial(i+degree)*(x/2)**(i) for i in range(terms+48)])
     else:
@@ -106,6 +175,56 @@ def bessel(x:float, degree:int, terms:int=120)->float:
 
 
 
+def bessel_j01(x:Union[float, np.ndarray])->Tuple[np.ndarray, np.ndarray]:
+    """Evaluate the Bessel functions J0 and J1 for a whole array of points in one call
+       x: point or array of points of evaluation
+       For |x| below BESSEL_SWITCH the power series is summed, above it Hankel's asymptotic expansion is used.
+       Both branches are accurate to about 1e-12 so there is no upper limit for x
+       returns a tuple (J0, J1) of arrays with the same shape as x
+    """
+    x = np.asarray(x, dtype=float)
+    instrumentation.bessel(x.size)
+    ax = np.abs(x)
+    small = ax<BESSEL_SWITCH
+    j0 = np.empty_like(ax)
+    j1 = np.empty_like(ax)
+    
+    #Power series: J_v(x) = sum((-1)**k/(k!(k+v)!)*(x/2)**(2k+v))
+    xs = ax[small]/2
+    t0 = np.ones_like(xs)
+    t1 = xs.copy()
+    s0 = t0.copy()
+    s1 = t1.copy()
+    x2 = -xs*xs
+    for k in range(1, BESSEL_SERIES_TERMS):
+        t0 *= x2/(k*k)
+        t1 *= x2/(k*(k+1))
+        s0 += t0
+        s1 += t1
+    j0[small] = s0
+    j1[small] = s1
+    
+    #Asymptotic expansion: J_v(x) = sqrt(2/(pi*x))*(P*cos(chi)-Q*sin(chi)), chi = x-(v/2+1/4)*pi
+    xl = ax[~small]
+    for degree, out in ((0, j0), (1, j1)):
+        mu = 4*degree**2
+        p = np.ones_like(xl)
+        q = np.zeros_like(xl)
+        a = np.ones_like(xl)
+        for k in range(1, BESSEL_ASYMPTOTIC_TERMS):
+            a = a*(mu-(2*k-1)**2)/(k*8*xl)
+            if k%2:
+                q += a if k%4 == 1 else -a
+            else:
+                p += a if k%4 == 0 else -a
+        chi = xl-(degree/2+1/4)*pi
+        out[~small] = np.sqrt(2/(pi*xl))*(p*np.cos(chi)-q*np.sin(chi))
+    
+    j1 = np.where(x<0, -j1, j1) #J1 is odd, J0 is even
+    return j0, j1
+
+
+
 def derivar(x:float, func:Callable[[float], float], diferencial:float=1e-8)->float:
     """Derivation of a function be numeric methods
        x: point to derivate the function
@@ -116,44 +235,278 @@ def derivar(x:float, func:Callable[[float], float], diferencial:float=1e-8)->flo
 
 
 
-def c_lambdas(biot:float, zeros:int, step:float=pi)->List[float]:
+def bessel_zeros(degree:int, zeros:int, iterations:int=3)->np.ndarray:
+    """Positive zeros of J0 or J1
+       degree: 0 or 1
+       zeros: number of zeros desired
+       McMahon's expansion gives the starting points that are then polished with Newton's method
+    """
+    beta = (np.arange(1, zeros+1)+degree/2-1/4)*pi
+    mu = 4*degree**2
+    b8 = 8*beta
+    found = beta-(mu-1)/b8-4*(mu-1)*(7*mu-31)/(3*b8**3)-32*(mu-1)*(83*mu**2-982*mu+3779)/(15*b8**5)
+    for i in range(iterations):
+        j0, j1 = bessel_j01(found)
+        if degree == 0:
+            found += j0/j1
+        else:
+            found -= j1/(j0-j1/found)
+    return found
+
+
+
+def brackets(typ_:str, zeros:int)->Tuple[np.ndarray, np.ndarray]:
+    """Intervals that contain exactly one lambda each, independent of the biot
+       typ_: geometry 'p', 'c' or 'e'
+       zeros: number of intervals
+       walls: ((n-1)pi, (n-1/2)pi), spheres: ((n-1)pi, n*pi), cylinders: (j1 zero n-1, j0 zero n)
+       returns lower and upper limits
+    """
+    n = np.arange(zeros)
+    if typ_ == 'p':
+        return n*pi, (n+1/2)*pi
+    if typ_ == 'e':
+        return n*pi, (n+1)*pi
+    lower = np.concatenate(([0.0], bessel_zeros(1, zeros-1))) if zeros>1 else np.zeros(zeros)
+    return lower, bessel_zeros(0, zeros)
+
+
+
+def starting_lambdas(typ_:str, biot:Union[float, np.ndarray], zeros:int)->np.ndarray:
+    """Asymptotic approximations of the lambdas used as starting points for solve_lambdas
+       typ_: geometry 'p', 'c' or 'e'
+       biot: biot of the system or array of biots (one row per biot)
+       zeros: number of lambdas desired
+       From the second lambda on the root is placed inside its bracket as the root of the large lambda form
+       of the characteristic equation: (lower+d)*tan(d) = biot for walls, tan(d) = lambda/(1-biot) for spheres and
+       for cylinders the wall form between the McMahon zeros of J1 and J0. The first lambda interpolates
+       between its small biot limit and the upper end of its bracket
+    """
+    biot = np.asarray(biot, dtype=float)[..., None]
+    lower, upper = brackets(typ_, zeros)
+    width = upper-lower
+    first = {'p':1, 'c':2, 'e':3}[typ_] #lambda**2 ~ k*biot for small biots
+    guess = np.empty(biot.shape[:-1]+(zeros,))
+    small = first*biot[..., 0]
+    guess[..., 0] = np.sqrt(small*upper[0]**2/(upper[0]**2+small))
+    if zeros>1:
+        if typ_ == 'e':
+            guess[..., 1:] = lower[1:]+np.arctan2(lower[1:]+pi/2, 1-biot)
+        else:
+            guess[..., 1:] = lower[1:]+width[1:]*2/pi*np.arctan(biot/lower[1:])
+    return guess
+
+
+
+def solve_lambdas(typ_:str, biot:Union[float, np.ndarray], zeros:int, guess:np.ndarray=None, tolerancia:float=1e-12, maxiter:int=100)->Tuple[np.ndarray, np.ndarray]:
+    """Find all the lambdas at once with a safeguarded Newton's method inside each bracket
+       typ_: geometry 'p', 'c' or 'e'
+       biot: biot of the system, an array of biots solves every one of them together (one row per biot)
+       zeros: number of lambdas desired
+       guess: starting values, starting_lambdas by default
+       tolerancia: relative size of the last correction (or of the bracket) to accept a lambda
+       maxiter: maximum number of iterations, raises StopIteration
+       Whenever a Newton step leaves its bracket it is replaced by bisection, the pole free versions of
+       the characteristic functions (pared_regular, cilindro_regular, esfera_regular) are used
+       returns the lambdas and the iterations used by each one
+    """
+    instrumentation.count("solve_lambdas")
+    fn, dfn = GEOMETRIES[typ_][:2]
+    biot = np.asarray(biot, dtype=float)
+    lower, upper = brackets(typ_, zeros)
+    shape = biot.shape+(zeros,)
+    if guess is None:
+        guess = starting_lambdas(typ_, biot, zeros)
+    biot = np.broadcast_to(biot[..., None], shape).ravel()
+    lower = np.broadcast_to(lower, shape).ravel().copy()
+    upper = np.broadcast_to(upper, shape).ravel().copy()
+    found = np.broadcast_to(guess, shape).ravel()
+    found = np.where((found>lower)&(found<upper), found, (lower+upper)/2)
+    sign_lower = np.sign(fn(lower, biot))
+    sign_lower[sign_lower == 0] = -1 #Lower limit of first wall and sphere bracket is zero
+    iterations = np.zeros(found.shape, dtype=int)
+    #With a biot of 0 the lower limits of the wall and cylinder brackets and the first of the sphere are the lambdas
+    exact = (biot == 0)&((lower == 0)|(typ_ != 'e'))
+    found[exact] = lower[exact]
+    active = np.flatnonzero(~exact)
+    for i in range(maxiter):
+        if not active.size:
+            break
+        x = found[active]
+        b = biot[active]
+        value = fn(x, b)
+        same = np.sign(value) == sign_lower[active]
+        lower[active] = np.where(same, x, lower[active])
+        upper[active] = np.where(same, upper[active], x)
+        lo = lower[active]
+        hi = upper[active]
+        step = np.where(value == 0, x, x-value/dfn(x, b))
+        outside = ~((step>=lo)&(step<=hi))
+        step[outside] = (lo[outside]+hi[outside])/2
+        found[active] = step
+        iterations[active] += 1
+        scale = tolerancia*np.maximum(step, 1) #Absolute below 1, the first lambda of small biots tends to 0
+        done = (np.abs(step-x)<=scale)|(hi-lo<=scale)|(value == 0)
+        active = active[~done]
+        if not active.size:
+            break
+    else:
+        raise StopIteration("Maximum number of iterations reached and no zero was found")
+    instrumentation.iterations(iterations)
+    return found.reshape(shape), iterations.reshape(shape)
+
+
+
+def c_lambdas(biot:float, zeros:int, step:float=pi, table:bool=True)->List[float]:
     """Determine the lambdas for a cylinder
-    The function is limited to a biot of 100 and to a max of 7 zeros
+    There is no limit for the biot nor for the number of zeros
     biot: biot of the system
     zeros: number of zeros desired
-    step: distance to check for the next lambda
+    step: kept for compatibility, lambdas are searched inside their brackets
+    table: look up the lambdas in the eigenvalue table when one is available
     """
-    if biot>MAX_BIOTC:
-        raise ValueError("Biot should be smaller than 100")
-    if zeros>MAX_LAMBDASC:
-        raise ValueError("No more than 7 zeros can be computed for cylinder")
-    return multiple_newtons(partial(cilindro, biot=biot), dcilindro, 2.4, zeros, step)
+    found = table_lambdas('c', biot, zeros) if table else None
+    if found is None:
+        found = solve_lambdas('c', biot, zeros)[0]
+    return [float(zero) for zero in found]
     
 
 
-def e_lambdas(biot:float, zeros:int, step:float=pi)->List[float]:
+def e_lambdas(biot:float, zeros:int, step:float=pi, table:bool=True)->List[float]:
     """Determine the lambdas for a sphere
     The function is limited to a biot of 1e5
     biot: biot of the system
     zeros: number of zeros desired
-    step: distance to check for the next lambda
+    step: kept for compatibility, lambdas are searched inside their brackets
+    table: look up the lambdas in the eigenvalue table when one is available
     """
     if biot>MAX_BIOTE:
         raise ValueError("Biot should be smaller than 1e5")
-    return multiple_newtons(partial(esfera, biot=biot), desfera, pi-1e-8, zeros, step)
+    found = table_lambdas('e', biot, zeros) if table else None
+    if found is None:
+        found = solve_lambdas('e', biot, zeros)[0]
+    return [float(zero) for zero in found]
 
 
 
-def p_lambdas(biot:float, zeros:int, step:float=pi)->List[float]:
+def p_lambdas(biot:float, zeros:int, step:float=pi, table:bool=True)->List[float]:
     """Determine the lambdas for a wall
     The function is limited to a biot of 1e5
     biot: biot of the system
     zeros: number of zeros desired
-    step: distance to check for the next lambda
+    step: kept for compatibility, lambdas are searched inside their brackets
+    table: look up the lambdas in the eigenvalue table when one is available
     """
     if biot>MAX_BIOTP:
         raise ValueError("Biot should be smaller than 1e5")
-    return multiple_newtons(partial(pared, biot=biot), dpared, pi/2-1e-8, zeros, step)
+    found = table_lambdas('p', biot, zeros) if table else None
+    if found is None:
+        found = solve_lambdas('p', biot, zeros)[0]
+    return [float(zero) for zero in found]
+
+
+
+# Pole free characteristic function, its derivative, largest biot in the table, number of lambdas stored and solver by geometry
+GEOMETRIES = {
+                'p': (pared_regular, dpared_regular, MAX_BIOTP, 40, p_lambdas),
+                'c': (cilindro_regular, dcilindro_regular, 100_000, 40, c_lambdas),
+                'e': (esfera_regular, desfera_regular, MAX_BIOTE, 40, e_lambdas),
+}
+
+
+
+def lambdas_batch(geometry:str, biots:List[float], n:int)->np.ndarray:
+    """Determine the lambdas for many biots at once
+       geometry: 'p', 'c' or 'e'
+       biots: biots of the systems, repeated values are solved once
+       n: number of lambdas for each biot
+       Every root is iterated in lock-step by solve_lambdas
+       returns an array with shape (len(biots), n)
+    """
+    if geometry not in GEOMETRIES:
+        raise ValueError(f"Nonexistent geometry, supported: {' '.join(GEOMETRIES.keys())}")
+    biots = np.asarray(biots, dtype=float).ravel()
+    limit = {'p': MAX_BIOTP, 'e': MAX_BIOTE}.get(geometry)
+    if limit and biots.size and biots.max()>limit:
+        raise ValueError("Biot should be smaller than 1e5")
+    unique, inverse = np.unique(biots, return_inverse=True)
+    return solve_lambdas(geometry, unique, n)[0][inverse]
+
+
+
+def table_path(typ_:str, directory:str=None)->str:
+    """Location of the eigenvalue table of a geometry
+       typ_: geometry 'p', 'c' or 'e'
+       directory: folder of the table, TABLE_DIR by default (TRANSIENT_ANALYSIS_TABLES environment variable)
+    """
+    return os.path.join(directory or TABLE_DIR, f"lambdas_{typ_}.npy")
+
+
+
+def build_table(typ_:str, path:str=None, zeros:int=None, points_decade:int=TABLE_POINTS_DECADE)->np.ndarray:
+    """Precompute the lambdas of a geometry over a log spaced biot grid and store them on disk
+       typ_: geometry 'p', 'c' or 'e'
+       path: file where to save the table, table_path(typ_) by default
+       zeros: number of lambdas to store for each biot, by default the number stated in GEOMETRIES
+       points_decade: density of the biot grid
+       Column 0 of the table holds the biots, the rest the lambdas
+       returns the table
+    """
+    max_biot, stored = GEOMETRIES[typ_][2:4]
+    zeros = zeros or stored
+    decades = np.log10(max_biot/TABLE_MIN_BIOT)
+    biots = np.logspace(np.log10(TABLE_MIN_BIOT), np.log10(max_biot), int(round(decades*points_decade))+1)
+    table = np.empty((len(biots), zeros+1))
+    table[:, 0] = biots
+    table[:, 1:] = solve_lambdas(typ_, biots, zeros)[0]
+    path = path or table_path(typ_)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    np.save(path, table)
+    _TABLES.pop(typ_, None)
+    return table
+
+
+
+def load_table(typ_:str, path:str=None)->np.ndarray:
+    """Memory map the eigenvalue table of a geometry so lookups use it
+       typ_: geometry 'p', 'c' or 'e'
+       path: file of the table, table_path(typ_) by default
+       returns the mapped table or None if the file does not exist
+    """
+    path = path or table_path(typ_)
+    _TABLES[typ_] = np.load(path, mmap_mode='r') if os.path.exists(path) else None
+    return _TABLES[typ_]
+
+
+
+def table_lambdas(typ_:str, biot:float, zeros:int)->List[float]:
+    """Lookup of lambdas in the eigenvalue table, interpolated in log(biot) and polished with Newton's method
+       typ_: geometry 'p', 'c' or 'e'
+       biot: biot of the system
+       zeros: number of zeros desired
+       returns None when there is no table or the request is outside of it
+    """
+    instrumentation.count("table_lambdas")
+    if typ_ not in _TABLES:
+        load_table(typ_)
+    table = _TABLES[typ_]
+    if table is None or zeros>table.shape[1]-1 or not table[0, 0]<=biot<=table[-1, 0]:
+        return None
+    position = np.log(biot/table[0, 0])/np.log(table[-1, 0]/table[0, 0])*(table.shape[0]-1)
+    row = min(int(position), table.shape[0]-2)
+    weight = position-row
+    guess = (1-weight)*table[row, 1:zeros+1]+weight*table[row+1, 1:zeros+1]
+    fn, dfn = GEOMETRIES[typ_][:2]
+    return _polish(fn, dfn, guess, biot, TABLE_POLISH)
+
+
+
+def _polish(fn:Callable[[float, float], float], dfn:Callable[[float, float], float], lambdas:np.ndarray, biot:float, steps:int)->np.ndarray:
+    """Newton steps over all the lambdas at once"""
+    lambdas = np.array(lambdas, dtype=float)
+    for i in range(steps):
+        lambdas -= fn(lambdas, biot)/dfn(lambdas, biot)
+    return lambdas
     
 
 
@@ -161,7 +514,13 @@ def p_lambdas(biot:float, zeros:int, step:float=pi)->List[float]:
 if __name__ == "__main__":
     args = sys.argv[1:]
     options = ("p", "c", "e")
-    if len(args) >= 2:
+    if len(args) >= 2 and args[0] == "table":
+        if args[1] in options:
+            build_table(args[1])
+            print(table_path(args[1]))
+        else:
+            print("nonexistent geometry")
+    elif len(args) >= 2:
         try:
             biot = float(args[1])
             zeros = 5
@@ -178,11 +537,7 @@ if __name__ == "__main__":
                     sys.exit()
                 print(zs)
             elif args[0] == "c":
-                if biot <= 100:
-                    zs = c_lambdas(biot=biot, zeros=zeros)
-                else:
-                    print("No computable")
-                    sys.exit()
+                zs = c_lambdas(biot=biot, zeros=zeros)
                 print(zs)
             elif args[0] == "e":
                 if biot<=100_000:
@@ -3,9 +3,17 @@ Fernando Jose Lavarreda Urizar
 Module design to test zeros and Transient Analysis
 """
 
+import json
 import pytest
+import warnings
+import numpy as np
+from math import pi
 import transient_analysis.zeros as zeros
 import transient_analysis.ganalysis as ganalysis
+import transient_analysis.instrumentation as instrumentation
+import transient_analysis.sweep as sweep
+import transient_analysis.fvolume as fvolume
+import transient_analysis.surrogate as surrogate
 
 
 TOLERANCE = 1e-4 #This means 0.0001 of difference respect values or in other words 0.01% error from results extracted from Wolfram Alfa.
@@ -49,9 +57,70 @@ def test_e_lambdas():
     assert results == pytest.approx(expected, TOLERANCE)
 
 
-def test_max_lambdas():
+def test_bessel():
+    #Values beyond the old limit of x=35 are included
+    j0, j1 = zeros.bessel_j01([1, 50, 120.5])
+    assert j0 == pytest.approx([0.765198, 0.055812, 0.068691], TOLERANCE)
+    assert j1 == pytest.approx([0.440051, -0.097512, 0.024047], TOLERANCE)
+    assert zeros.bessel(2.404826, 0) == pytest.approx(0, abs=1e-6)
+    assert zeros.bessel(-1, 1) == pytest.approx(-0.440051, TOLERANCE)
+
+
+def test_solve_lambdas():
+    #Every biot is solved together, one row per biot
+    lambdas, iterations = zeros.solve_lambdas("p", [0.02, 5, 30], 6)
+    assert lambdas[1] == pytest.approx([1.313837, 4.033567, 6.909595, 9.892752, 12.935222, 16.010658], TOLERANCE)
+    assert lambdas[2] == pytest.approx([1.520167, 4.561494, 7.605689, 10.654324, 13.708547, 16.769056], TOLERANCE)
+    assert iterations.shape == (3, 6) and iterations.max() < 20
+    lower, upper = zeros.brackets("c", 5)
+    assert lower[1:] == pytest.approx(zeros.bessel_zeros(1, 4))
+    assert upper == pytest.approx([2.404826, 5.520078, 8.653728, 11.791534, 14.930918], TOLERANCE)
+    lambdas, iterations = zeros.solve_lambdas("e", 30, 6)
+    assert lambdas == pytest.approx([3.037240, 6.076634, 9.120085, 12.169063, 15.224528, 18.286950], TOLERANCE)
+
+
+def test_lambdas_batch():
+    biots = [5, 0.02, 5]+[0.01*i for i in range(1, 200)]
+    results = zeros.lambdas_batch("c", biots, 5)
+    assert results.shape == (len(biots), 5)
+    assert results[0] == pytest.approx([1.989814, 4.713142, 7.617707, 10.622300, 13.678558], TOLERANCE)
+    assert results[1] == pytest.approx([0.199501, 3.836921, 7.018436, 10.175433, 13.325192], TOLERANCE)
+    assert results[57] == pytest.approx(zeros.c_lambdas(biots[57], 5, table=False))
     with pytest.raises(ValueError):
-        zeros.c_lambdas(2, zeros.MAX_LAMBDASC+1)
+        zeros.lambdas_batch("p", [1, zeros.MAX_BIOTP+1], 3)
+
+
+def test_zero_biot():
+    #Nothing leaves the body, the first lambda is 0 and the rest are the roots with an insulated surface
+    assert zeros.p_lambdas(0, 3) == pytest.approx([0, pi, 2*pi], abs=1e-9)
+    assert zeros.c_lambdas(0, 3) == pytest.approx([0, 3.831706, 7.015587], TOLERANCE)
+    assert zeros.e_lambdas(0, 3) == pytest.approx([0, 4.493409, 7.725252], TOLERANCE)
+    assert zeros.lambdas_batch("c", [0, 1], 3)[0] == pytest.approx([0, 3.831706, 7.015587], TOLERANCE)
+    result = sweep.sweep(geometries=["p", "c", "e"], biots=[0, 1], alfas=[1e-5], lengths=[0.1], times=[10, 100],\
+                         positions=[0, 0.5, 1], st=100, at=0, workers=0)
+    assert result.sel(biot=0) == pytest.approx(100)
+
+
+def test_table_lambdas(tmp_path, monkeypatch):
+    monkeypatch.setattr(zeros, "_TABLES", {})
+    for typ_ in ("p", "e", "c"):
+        path = str(tmp_path/f"lambdas_{typ_}.npy")
+        zeros.build_table(typ_, path=path, points_decade=10)
+        assert zeros.load_table(typ_, path) is not None
+    assert zeros.table_lambdas("p", 5, 6) == pytest.approx([1.313837, 4.033567, 6.909595, 9.892752, 12.935222, 16.010658], TOLERANCE)
+    assert zeros.e_lambdas(0.02, 6) == pytest.approx([0.244459, 4.497860, 7.727840, 10.905955, 14.067615, 17.221916], TOLERANCE)
+    assert zeros.c_lambdas(5, 5) == pytest.approx([1.989814, 4.713142, 7.617707, 10.622300, 13.678558], TOLERANCE)
+    assert zeros.table_lambdas("p", zeros.TABLE_MIN_BIOT/2, 6) is None
+
+
+def test_many_c_lambdas():
+    #Cylinders are no longer limited in biot nor in number of lambdas
+    results = zeros.c_lambdas(5e4, 150)
+    assert len(results) == 150
+    assert results[:3] == pytest.approx([2.404777, 5.519968, 8.653555], TOLERANCE)
+    assert all(lower<l<upper for l, lower, upper in zip(results, *zeros.brackets("c", 150)))
+    lambdas, iterations = zeros.solve_lambdas("c", [1e-5, 2, 1e6], 100)
+    assert iterations.max() <= 6
 
 
 def test_max_biots():
@@ -60,9 +129,7 @@ def test_max_biots():
     
     with pytest.raises(ValueError):
         zeros.e_lambdas(zeros.MAX_BIOTE+1, 5)
-    
-    with pytest.raises(ValueError):
-        zeros.c_lambdas(zeros.MAX_BIOTC+1, 5)
+
 
 
 def test_temp_profile():
@@ -91,3 +158,363 @@ def test_temp_profiles():
 
 
 
+def test_temp_profiles_matrix():
+    #Same values as evaluating every coordinate with the scalar gradients
+    for typ_, gradient in (('p', ganalysis.gradient_p), ('c', ganalysis.gradient_c), ('e', ganalysis.gradient_e)):
+        alfa, lambdas, biot_, coordinates, temperatures = ganalysis.temp_profiles(times=[10, 200, 3000], typ_=typ_, st=20, at=500, length=0.1,\
+                                                                                  cond=14.9, conv=80, dx=0.01, nlambdas=8, alfa=3.95e-6, detailed=True)
+        assert len(temperatures) == 3 and len(temperatures[0]) == len(coordinates)
+        expected = ganalysis.temperature_g(gradient(lambdas, coordinates[4], 0.1, ganalysis.tau(3.95e-6, 200, 0.1)), 20, 500)
+        assert temperatures[1][4] == pytest.approx(expected)
+
+
+def test_tolerance():
+    counts = ganalysis.terms_needed([1e-4, 1e-2, 0.2, 10], 1e-6)
+    assert list(counts) == sorted(counts, reverse=True) and counts[-1] == 1
+    system = dict(typ_='c', st=600, at=200, length=0.1, cond=14.9, conv=800, coord=[0, 0.05, 0.1], alfa=3.95e-6)
+    times = [1, 30, 600, 5000]
+    expected = ganalysis.temp_profiles(times=times, nlambdas=400, **system)[1]
+    results = ganalysis.temp_profiles(times=times, tolerance=0.01, **system)[1]
+    for result, reference in zip(results, expected):
+        assert result == pytest.approx(reference, abs=0.01)
+    assert ganalysis.temp_profile(time_=1, tolerance=0.01, **system)[1] == pytest.approx(expected[0], abs=0.01)
+    #Exact at tau 0 without any lambda, an error when the lambdas can not meet the tolerance
+    assert ganalysis.terms_needed([0], 1e-6)[0] == 0
+    alfa, lambdas, biot_, coordinates, temperatures = ganalysis.temp_profiles(times=[0, 600], tolerance=0.01, detailed=True, **system)
+    assert temperatures[0] == [600]*3 and len(lambdas)<20
+    points = {key:value for key, value in system.items() if key != "coord"}
+    assert ganalysis.evaluate_points(positions=[0, 0.1], times=0, tolerance=0.01, **points) == pytest.approx([600, 600])
+    with pytest.raises(ValueError):
+        ganalysis.temp_profiles(times=[1e-7], tolerance=1e-3, typ_='p', st=1, at=0, length=1, biot_=1000, alfa=1, coord=[0, 1])
+    with pytest.raises(ValueError):
+        ganalysis.temp_profiles(times=[1], tolerance=1e-6, lambdas_=lambdas[:2], **system)
+
+
+def test_one_term_regime():
+    system = dict(typ_='c', st=600, at=200, length=0.1, cond=14.9, conv=80, dx=0.005, nlambdas=7, cp=477, density=7900)
+    alfa, lambdas, biot_, coordinates, temperatures, regimes = ganalysis.temp_profiles(times=[100, 45*60, 3000], regime="auto", detailed=True, **system)
+    assert regimes == ["series", "one-term", "one-term"]
+    assert temperatures[1][0] == pytest.approx(364, 1e-2)
+    one_term = ganalysis.temperature_g(ganalysis.gradient_c(lambdas[:1], 0, 0.1, ganalysis.tau(alfa, 3000, 0.1)), 600, 200)
+    assert temperatures[2][0] == pytest.approx(one_term)
+    assert temperatures[0] == pytest.approx(ganalysis.temp_profiles(times=[100], **system)[1][0])
+    assert ganalysis.temp_profile(time_=45*60, regime="auto", detailed=True, **system)[-1] == "one-term"
+    #A tolerance only accepts the first lambda where it meets it
+    for typ_ in ('p', 'c', 'e'):
+        system = dict(typ_=typ_, st=600, at=200, length=1, biot_=100, alfa=1, coord=[0, 0.5, 1])
+        reference = ganalysis.temp_profiles(times=[0.2, 0.3], nlambdas=200, **system)[1]
+        result = ganalysis.temp_profiles(times=[0.2, 0.3], regime="auto", tolerance=1e-3, **system)[1]
+        assert np.array(result) == pytest.approx(np.array(reference), abs=1e-3)
+
+
+def test_semi_infinite_regime():
+    for typ_ in "pce":
+        for biot_ in (0.5, 5, 200):
+            system = dict(typ_=typ_, st=1, at=0, length=1, alfa=1, biot_=biot_, coord=[0, 0.3, 0.9, 0.99, 1])
+            crossover = ganalysis.SEMI_INFINITE_TAU[typ_]
+            times = [crossover/10, crossover*0.75, crossover*1.5]
+            alfa, lambdas, biot_, coordinates, temperatures, regimes = ganalysis.temp_profiles(times=times, regime="auto", detailed=True, **system)
+            assert regimes == ["semi-infinite", "blended", "series"]
+            converged = ganalysis.temp_profiles(times=times[:2], nlambdas=300, **system)[1]
+            assert np.array(temperatures[:2]) == pytest.approx(np.array(converged), abs=2e-4)
+        #A tolerance below the error of the semi-infinite solid keeps the series
+        system = dict(typ_=typ_, st=1, at=0, length=1, alfa=1, biot_=1000, coord=[0, 0.5, 0.9, 0.99, 1])
+        times = [ganalysis.SEMI_INFINITE_TAU[typ_]/3, ganalysis.SEMI_INFINITE_TAU[typ_]*0.75]
+        converged = ganalysis.temp_profiles(times=times, nlambdas=600, **system)[1]
+        result = ganalysis.temp_profiles(times=times, regime="auto", tolerance=1e-7, detailed=True, **system)
+        assert result[-1] == ["series", "series"]
+        assert np.array(result[4]) == pytest.approx(np.array(converged), abs=1e-7)
+    assert ganalysis.erfcx(np.array([-1, 0, 2])) == pytest.approx([5.00898008, 1, 0.25539568], 1e-6)
+
+
+def test_start_time():
+    #At tau 0 nothing has changed, without warnings from the semi-infinite solid
+    for typ_ in "pce":
+        system = dict(typ_=typ_, length=0.1, cond=14.9, conv=80, alfa=4e-6, regime="auto")
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            assert ganalysis.temp_profiles(times=[0, 10], st=600, at=200, dx=0.05, **system)[1][0] == pytest.approx([600]*3)
+            assert ganalysis.evaluate_points(positions=[0, 0.1], times=0, st=600, at=200, **system) == pytest.approx([600]*2)
+            assert next(ganalysis.iter_temp_profiles(times=[0, 10], st=600, at=200, dx=0.05, **system))[1] == pytest.approx([600]*3)
+            response = ganalysis.ambient_response(times=[0, 10, 20], ambients=[200, 300, 300], st=600, dx=0.05, **system)
+            assert response.temperatures[0] == pytest.approx([600]*3)
+        assert ganalysis.semi_infinite(typ_, 5, [0, 0.5, 1], [0]) == pytest.approx(np.ones((1, 3)))
+
+
+def test_lumped_regime():
+    #Small sphere of example 4-1 from 'Heat and Mass Transfer by Yunus A. Çengel and Afshin J. Ghajar.', biot with Lc of 0.001
+    system = dict(typ_='e', st=25, at=120, length=0.0006, cond=35, conv=510, alfa=35/(8500*320), coord=[0, 0.0006])
+    alfa, lambdas, biot_, coordinates, temperatures, regimes = ganalysis.temp_profiles(times=[1, 5, 10], regime="auto", detailed=True, **system)
+    assert regimes == ["lumped"]*3 and lambdas == []
+    b = 510/(8500*320*0.0002)
+    assert [row[0] for row in temperatures] == pytest.approx([120+(25-120)*np.exp(-b*t) for t in (1, 5, 10)])
+    assert temperatures[2][0] == temperatures[2][1]
+    series = ganalysis.temp_profiles(times=[1, 5, 10], nlambdas=10, **system)[1]
+    assert np.array(temperatures) == pytest.approx(np.array(series), abs=0.5)
+    assert ganalysis.temp_profile(time_=5, typ_='p', st=25, at=120, length=0.05, biot_=5, alfa=1e-5, dx=0.01, regime="lumped", detailed=True)[-1] == "lumped"
+    assert ganalysis.temp_profiles(times=[1], regime="auto", detailed=True, **dict(system, conv=51000))[-1] != ["lumped"]
+    #The error of the isothermal body is not bounded by a tolerance, the series is used instead
+    system = dict(typ_='e', st=600, at=200, length=0.1, biot_=0.25, alfa=1e-5)
+    reference = ganalysis.temp_profiles(times=[50, 100, 150], coord=[0, 0.05, 0.1], nlambdas=200, **system)[1]
+    result = ganalysis.temp_profiles(times=[50, 100, 150], coord=[0, 0.05, 0.1], regime="auto", tolerance=0.01, detailed=True, **system)
+    assert "lumped" not in result[-1]
+    assert np.array(result[4]) == pytest.approx(np.array(reference), abs=0.01)
+    points = ganalysis.evaluate_points(positions=[0, 0.05, 0.1], times=[50, 100, 150], regime="auto", tolerance=0.01, **system)
+    assert points == pytest.approx(np.diag(reference), abs=0.01)
+
+
+def test_iter_temp_profiles():
+    system = dict(typ_='c', st=600, at=200, length=0.1, cond=14.9, conv=80, dx=0.005, cp=477, density=7900)
+    times = [1, 100, 45*60, 3000, 5000]
+    expected = ganalysis.temp_profiles(times=times, **system)[1]
+    frames = ganalysis.iter_temp_profiles(times=iter(times), **system)
+    assert next(frames) == (1, pytest.approx(expected[0]))
+    assert [time_ for time_, temperatures in frames] == times[1:]
+    chunks = list(ganalysis.iter_temp_profiles(times=times, chunk=2, **system))
+    assert [len(block) for block, temperatures in chunks] == [2, 2, 1]
+    assert np.array(sum((temperatures for block, temperatures in chunks), [])) == pytest.approx(np.array(expected))
+    #Later timestamps that need more lambdas solve them again
+    system.update(tolerance=1e-3, regime="auto")
+    streamed = [temperatures for time_, temperatures in ganalysis.iter_temp_profiles(times=[3000, 200, 5], **system)]
+    assert np.array(streamed) == pytest.approx(np.array(ganalysis.temp_profiles(times=[3000, 200, 5], **system)[1]))
+
+
+def test_heat_transfer_history():
+    #Example of the steel shaft, Q/Qmax of 0.62 with the one term approximation
+    alfa, lambdas, biot_, coordinates, temperatures = ganalysis.temp_profile(typ_='c', st=600, at=200, length=0.1, cond=14.9, conv=80,\
+                                                                             time_=45*60, dx=0.005, nlambdas=7, cp=477, density=7900, detailed=True)
+    assert ganalysis.heat_transfer_history('c', lambdas, [45*60], alfa, 0.1)[0] == pytest.approx(0.62, 3e-2)
+    #Same as integrating a fine profile of the series
+    positions = np.linspace(0, 1, 20001)
+    for typ_, exponent in (('p', 0), ('c', 1), ('e', 2)):
+        lambdas = ganalysis.LAMBDAS[typ_](5, 100)
+        history = ganalysis.heat_transfer_history(typ_, lambdas, [0.01, 0.3, 50], 1, 1, qmax=-10)
+        for fraction, tau in zip(history, [0.01, 0.3]):
+            gradients = ganalysis.series(ganalysis.coefficient_matrix(typ_, lambdas, positions, 1), lambdas, [tau])[0]
+            assert fraction == pytest.approx(-10*(1-(exponent+1)*ganalysis.simpson_weights(positions)@(gradients*positions**exponent)), 1e-6)
+        assert history[-1] == pytest.approx(-10)
+
+
+def test_q_batch():
+    assert ganalysis.simpson_weights([0, 0.1, 0.4, 0.5, 1]) @ np.array([0, 0.1, 0.4, 0.5, 1])**2 == pytest.approx(1/3)
+    assert ganalysis.simpson_weights([0, 0.5, 0.7, 1]) @ np.array([0, 0.5, 0.7, 1])**2 == pytest.approx(1/3)
+    #Same as the closed form on a non-uniform grid, denser close to the surface
+    coordinates = (0.1*np.sin(np.linspace(0, pi/2, 81))).tolist()
+    times = [60, 600, 2700]
+    system = dict(st=600, at=200, length=0.1, cond=14.9, conv=80, coord=coordinates, nlambdas=40, cp=477, density=7900)
+    volumes = {'p':2*0.5*0.1, 'c':pi*0.1**2*2, 'e':4/3*pi*0.1**3}
+    batches = {'p':lambda profiles: ganalysis.q_p_batch(profiles, coordinates, 600, 0.5, 7900, 477),
+               'c':lambda profiles: ganalysis.q_c_batch(profiles, coordinates, 600, 2, 7900, 477),
+               'e':lambda profiles: ganalysis.q_e_batch(profiles, coordinates, 600, 7900, 477)}
+    for typ_, batch in batches.items():
+        alfa, lambdas, biot_, coordinates_, temperatures = ganalysis.temp_profiles(times=times, typ_=typ_, detailed=True, **system)
+        expected = ganalysis.heat_transfer_history(typ_, lambdas, times, alfa, 0.1, qmax=7900*volumes[typ_]*477*(200-600))
+        assert batch(temperatures) == pytest.approx(expected, 1e-4)
+
+
+def test_time_to_temperature():
+    system = dict(typ_='c', st=600, at=200, length=0.1, cond=14.9, conv=80, cp=477, density=7900)
+    times = ganalysis.time_to_temperature(targets=[[364], [500]], positions=[0, 0.05, 0.1], **system)
+    assert times.shape == (2, 3)
+    assert times[0][0] == pytest.approx(45*60, 1e-2)
+    for targets, row in zip((364, 500), times):
+        temperatures = ganalysis.temp_profiles(times=row.tolist(), coord=[0, 0.05, 0.1], nlambdas=40, **system)[1]
+        assert np.diag(temperatures) == pytest.approx([targets]*3, abs=1e-6)
+    paired = ganalysis.time_to_temperature(targets=[364, 500], positions=[0, 0.1], **system)
+    assert paired == pytest.approx([times[0][0], times[1][2]])
+    with pytest.raises(ValueError):
+        ganalysis.time_to_temperature(targets=150, positions=0, **system)
+    with pytest.raises(ValueError):
+        ganalysis.time_to_temperature(targets=599.9999, positions=0.1, **system)
+
+
+def test_product_profiles():
+    #Short brass cylinder from 'Heat and Mass Transfer by Yunus A. Çengel and Afshin J. Ghajar.', center at 63.9 after 15 minutes
+    coordinates, temperatures = ganalysis.product_profiles(shape='short-cylinder', st=120, at=25, lengths=[0.05, 0.075], times=[900],\
+                                                           cond=110, conv=60, alfa=3.39e-5, coords=[[0, 0.05], [0, 0.075]])
+    assert temperatures.shape == (1, 2, 2)
+    assert temperatures[0, 0, 0] == pytest.approx(63.9, 2e-2)
+    #Every point is the product of the 1D gradients
+    system = dict(st=20, at=500, cond=14.9, conv=80, alfa=3.95e-6, dx=0.01)
+    coordinates, temperatures = ganalysis.product_profiles(shape='brick', lengths=[0.1, 0.05, 0.05], times=[10, 200], dtype=np.float32, **system)
+    assert temperatures.shape == (2, 11, 6, 6) and temperatures.dtype == np.float32
+    gradients = [(np.array(ganalysis.temp_profiles(times=[10, 200], typ_='p', length=length, **system)[1])-500)/(20-500) for length in (0.1, 0.05)]
+    assert temperatures[1, 3, 2, 5] == pytest.approx(500-480*gradients[0][1][3]*gradients[1][1][2]*gradients[1][1][5], 1e-5)
+    assert temperatures[0, 4, 1, 3] == temperatures[0, 4, 3, 1]
+
+
+def test_sweep():
+    parameters = dict(geometries=['p', 'c'], biots=[5, 0.5, 5, 2], alfas=[1e-5, 3.95e-6], lengths=[0.1, 0.02], times=[10, 200, 3000],\
+                      positions=[0, 0.5, 1], st=20, at=500, nlambdas=8)
+    serial = sweep.sweep(workers=0, chunk=3, **parameters)
+    assert serial.values.shape == (2, 4, 2, 2, 3, 3)
+    expected = ganalysis.temp_profiles(times=[10, 200, 3000], typ_='c', st=20, at=500, length=0.02, biot_=2, alfa=3.95e-6,\
+                                       coord=[0, 0.01, 0.02], nlambdas=8)[1]
+    assert serial.sel(geometry='c', biot=2, alfa=3.95e-6, length=0.02) == pytest.approx(np.array(expected))
+    assert serial.sel(biot=5).shape == (2, 2, 2, 3, 3)
+    parallel = sweep.sweep(workers=2, chunk=1, **parameters)
+    assert np.array_equal(parallel.values, serial.values)
+
+
+def test_coefficient_cache(monkeypatch):
+    monkeypatch.setattr(ganalysis, "COEFFICIENTS", ganalysis.CoefficientCache())
+    system = dict(typ_='e', st=5, at=95, length=0.025, cond=0.627, conv=1200, dx=0.005, nlambdas=7, alfa=0.151e-6)
+    first = ganalysis.temp_profiles(times=[100, 865], **system)
+    assert ganalysis.temp_profiles(times=[100, 865], **system) == first
+    ganalysis.temp_profile(time_=865, **system)
+    stats = ganalysis.COEFFICIENTS.stats()
+    assert stats["misses"] == 1 and stats["hits"] == 2 and stats["entries"] == 1
+    coefficients = ganalysis.cached_coefficients('p', [1, 2], [0, 0.5], 1)
+    assert not coefficients.flags.writeable
+    #Only the most recent matrices that fit are kept
+    cache = ganalysis.CoefficientCache(maxbytes=2*coefficients.nbytes)
+    for length in (1, 2, 3, 1):
+        cache.get('p', [1, 2], [0, 0.5], length)
+    assert cache.stats()["evictions"] == 2 and cache.stats()["misses"] == 4 and cache.nbytes == 2*coefficients.nbytes
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+
+
+def test_profile_set():
+    system = dict(typ_='c', st=600, at=200, length=0.1, cond=14.9, conv=80, dx=0.005, nlambdas=7, cp=477, density=7900)
+    times = [100, 45*60, 3000]
+    profiles = ganalysis.profile_set(times=times, **system)
+    assert profiles.temperatures.shape == (3, 21) and profiles.temperatures.dtype == np.float64
+    assert profiles.profile(1)[0] == pytest.approx(364, 1e-2)
+    assert np.shares_memory(profiles.profile(1), profiles.temperatures) and np.shares_memory(profiles.history(0), profiles.temperatures)
+    assert profiles.history(0)[1] == profiles.profile(1)[0]
+    #Works where the lists were used
+    coordinates, temperatures = profiles
+    assert (coordinates, temperatures) == tuple(ganalysis.temp_profiles(times=times, **system))
+    detailed = ganalysis.profile_set(times=times, detailed=True, regime="auto", **system)
+    assert len(detailed) == 6 and detailed[2] == detailed.biot and detailed[5] == ["series", "one-term", "one-term"]
+    assert detailed[3]+detailed[3] == coordinates+coordinates
+    assert not hasattr(profiles, "__dict__")
+
+
+def test_write_profiles(tmp_path):
+    system = dict(typ_='p', st=20, at=500, length=0.02, cond=110, conv=120, dx=0.001, nlambdas=7, alfa=33.9e-6)
+    times = list(range(1, 1002, 10))
+    path = str(tmp_path/"run.npy")
+    assert ganalysis.write_profiles(path, times=times, chunk=16, **system) == path
+    profiles = ganalysis.open_profiles(path)
+    assert isinstance(profiles.temperatures, np.memmap)
+    assert profiles.temperatures.shape == (len(times), 21)
+    expected = ganalysis.profile_set(times=times, detailed=True, **system)
+    assert np.array_equal(profiles.temperatures, expected.temperatures)
+    assert profiles.history(20)[42] == expected.temperatures[42, 20]
+    assert list(profiles.lambdas) == expected[1] and profiles.biot == expected.biot and list(profiles.times) == times
+    with open(ganalysis.header_path(path)) as file:
+        assert json.load(file)["inputs"]["typ_"] == 'p'
+
+
+def test_ambient_response():
+    system = dict(typ_='p', length=0.02, cond=110, conv=120, dx=0.005, nlambdas=7, alfa=33.9e-6)
+    times = np.linspace(0, 600, 301)
+    constant = ganalysis.ambient_response(times=times, ambients=[500]*301, st=20, **system)
+    assert constant.temperatures[1:] == pytest.approx(np.array(ganalysis.temp_profiles(times=times[1:].tolist(), st=20, at=500, **system)[1]))
+    assert constant.temperatures[0] == pytest.approx([20]*5)
+    #Ramp and hold against the direct sum of the step responses
+    ambients = np.minimum(20+times, 300)
+    ramp = ganalysis.ambient_response(times=times+50, ambients=ambients, st=20, **system)
+    steps = 1-np.array(ganalysis.temp_profiles(times=times[1:].tolist(), st=1, at=0, **system)[1])
+    changes = np.diff(ambients, prepend=20)
+    for i in (1, 150, 300):
+        assert ramp.temperatures[i] == pytest.approx(20+sum(changes[k]*steps[i-k-1] for k in range(i)))
+    #The first time is not evaluated, its lambdas are not solved either
+    tolerant = ganalysis.ambient_response(times=times+50, ambients=[500]*301, st=20, tolerance=0.01, regime="auto", **system)
+    expected = ganalysis.temp_profiles(times=times[1:].tolist(), st=1, at=0, tolerance=0.01, regime="auto", detailed=True, **system)
+    assert len(tolerant.lambdas) == len(expected[1]) and tolerant.regimes == ["semi-infinite"]+expected[-1]
+    assert tolerant.temperatures[1:] == pytest.approx(500+(20-500)*np.array(expected[4]))
+    with pytest.raises(ValueError):
+        ganalysis.ambient_response(times=[0, 1, 3], ambients=[1, 2, 3], st=20, **system)
+
+
+def test_fvolume():
+    lower, diagonal, upper, rhs = np.array([0, 1, 2, 1, 1.]), np.array([4, 5, 6, 5, 4.]), np.array([1, 2, 1, 1, 0.]), np.array([1, 2, 3, 4, 5.])
+    matrix = np.diag(diagonal)+np.diag(lower[1:], -1)+np.diag(upper[:-1], 1)
+    assert fvolume.cyclic_reduction(lower, diagonal, upper, rhs) == pytest.approx(np.linalg.solve(matrix, rhs))
+    #Same as the series for constant properties
+    for typ_ in "pce":
+        system = dict(typ_=typ_, st=20, at=500, length=0.02, cond=110, conv=1200, alfa=33.9e-6, dx=0.005)
+        coordinates, temperatures = fvolume.temp_profiles(times=[420, 10, 100], cells=400, **system)
+        expected = ganalysis.temp_profiles(times=[420, 10, 100], nlambdas=60, **system)
+        assert coordinates == expected[0]
+        assert np.array(temperatures) == pytest.approx(np.array(expected[1]), abs=0.2)
+    #Properties as functions of the temperature
+    system = dict(typ_='c', st=600, at=200, length=0.1, conv=80, density=7900, coord=[0, 0.1], times=[45*60])
+    constant = fvolume.temp_profiles(cond=14.9, cp=477, **system)[1]
+    assert constant[0][0] == pytest.approx(364, 1e-2)
+    assert fvolume.temp_profiles(cond=lambda t: np.full(t.shape, 14.9), cp=lambda t: 477+0*t, **system)[1][0] == pytest.approx(constant[0])
+    #Higher capacity at high temperatures slows the cooling
+    varying = fvolume.temp_profiles(cond=14.9, cp=lambda t: 477+(t-200), **system)[1]
+    assert varying[0][0]>constant[0][0]+10
+
+
+def test_evolve_profile():
+    #Chaining two steps of a process is the same as a single one
+    for typ_ in "pce":
+        system = dict(typ_=typ_, at=200, length=0.1, cond=14.9, conv=80, cp=477, density=7900, nlambdas=60)
+        positions = np.linspace(0, 0.1, 401).tolist()
+        previous = ganalysis.temp_profiles(times=[600], st=600, coord=positions, **system)[1][0]
+        coordinates, temperatures = ganalysis.evolve_profile(initial=previous, initial_coord=positions, times=[900, 2100], dx=0.01, **system)
+        expected = ganalysis.temp_profiles(times=[1500, 2700], st=600, dx=0.01, **system)[1]
+        assert np.array(temperatures) == pytest.approx(np.array(expected), abs=1e-3)
+    #A uniform profile projects onto the coefficients of the series
+    lambdas = ganalysis.LAMBDAS['e'](5, 10)
+    positions = np.linspace(0, 1, 1001)**2
+    projection = ganalysis.modal_projection('e', lambdas, positions, 1)
+    assert projection@np.ones(len(positions)) == pytest.approx(ganalysis.amplitudes('e', lambdas), abs=1e-6)
+
+
+def test_surrogate(tmp_path):
+    fitted = surrogate.Surrogate.build('c', 5, tau_range=(1e-2, 5), tolerance=1e-6)
+    assert fitted.error<=1e-6
+    generator = np.random.default_rng(3)
+    positions, taus = generator.random(200), np.exp(generator.uniform(np.log(1e-2), np.log(5), 200))
+    lambdas = ganalysis.LAMBDAS['c'](5, 100)
+    exact = [ganalysis.gradient_c(lambdas, position, 1, tau) for position, tau in zip(positions, taus)]
+    assert fitted(positions, taus) == pytest.approx(exact, abs=2e-6)
+    #Same temperatures as the series for a system with the same biot
+    system = dict(typ_='c', st=600, at=200, length=0.1, cond=14.9, conv=80*5/ganalysis.biot(80, 0.1, 14.9), cp=477, density=7900, nlambdas=40)
+    alfa = 14.9/(477*7900)
+    expected = ganalysis.temp_profiles(times=[600, 2700], coord=[0, 0.05], **system)[1]
+    temperatures = fitted.temperatures([[0, 0.05]], [[600], [2700]], st=600, at=200, alfa=alfa, length=0.1)
+    assert temperatures == pytest.approx(np.array(expected), abs=1e-3)
+    path = str(tmp_path/"surrogate.json")
+    fitted.save(path)
+    assert np.array_equal(surrogate.Surrogate.load(path)(positions, taus), fitted(positions, taus))
+    with pytest.raises(ValueError):
+        fitted(0.5, 10)
+
+
+def test_evaluate_points():
+    system = dict(typ_='c', st=600, at=200, length=0.1, cond=14.9, conv=80, cp=477, density=7900, nlambdas=7)
+    positions, times = [0, 0.03, 0.1, 0.07], [5, 100, 45*60, 7000]
+    for options in ({}, {"regime":"auto"}, {"tolerance":1e-3}):
+        paired = ganalysis.evaluate_points(positions=positions, times=times, **system, **options)
+        expected = [ganalysis.temp_profiles(times=[time_], coord=[position], **system, **options)[1][0][0] for position, time_ in zip(positions, times)]
+        assert paired == pytest.approx(expected)
+    assert ganalysis.evaluate_points(positions=0, times=45*60, **system) == pytest.approx(364, 1e-2)
+    grid = ganalysis.evaluate_points(positions=[[0, 0.05, 0.1]], times=[[60], [600]], **system)
+    assert grid == pytest.approx(np.array(ganalysis.temp_profiles(times=[60, 600], coord=[0, 0.05, 0.1], **system)[1]))
+    lumped = ganalysis.evaluate_points(positions=[0, 0.1], times=[10, 20], regime="lumped", **system)
+    assert lumped == pytest.approx(ganalysis.temperature_g(ganalysis.lumped('c', ganalysis.biot(80, 0.1, 14.9),\
+                                                                                ganalysis.tau(14.9/(477*7900), np.array([10, 20]), 0.1)), 600, 200))
+
+
+def test_instrumentation():
+    with instrumentation.collect() as report:
+        ganalysis.temp_profiles(times=[100, 865], typ_='e', st=5, at=95, length=0.025, cond=0.627, conv=1200, dx=0.005, nlambdas=7, alfa=0.151e-6)
+        ganalysis.temp_profile(typ_='c', st=600, at=200, length=0.1, cond=14.9, conv=80, time_=45*60, dx=0.005, nlambdas=7, cp=477, density=7900)
+        zeros.c_lambdas(5, 5, table=False)
+    summary = report.as_dict()
+    assert summary["calls"]["temp_profiles"] == 1 and summary["calls"]["temp_profile"] == 1
+    assert summary["newton"]["roots"]>=5
+    assert summary["bessel_evaluations"]>0 and summary["terms"]>0
+    assert summary["phases"]["series"]["calls"] == 2
+    assert summary["peak_memory"]>0
+    assert instrumentation.report() is None or instrumentation.report() is not report
+
+
+